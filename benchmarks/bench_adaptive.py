@@ -0,0 +1,101 @@
+"""Upload bytes and encode time per image: fixed 1024px cap vs adaptive sizing.
+
+Runs a sparse dialog, the form-like window from bench_encode, a dense
+table and a photo-like image through CaptureEncoder. It does this once
+with the fixed cap and once in adaptive mode, with optional byte or
+token budgets. For each image it reports the upload size, the encoded
+bytes and the prepare (analyse + resize) and encode times.
+
+    python benchmarks/bench_adaptive.py --budget-kb 150
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+from bench_encode import RESOLUTIONS, make_screen
+from capture_active_window import PIXELS_PER_TOKEN, CaptureEncoder, content_profile
+
+
+def make_dialog(width, height):
+    """A mostly empty window with a small message box"""
+    image = Image.new("RGB", (width, height), (245, 247, 250))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, 48), fill=(74, 107, 175))
+    left, top = width // 2 - 200, height // 2 - 80
+    draw.rectangle((left, top, left + 400, top + 160), outline=(180, 185, 195), fill=(255, 255, 255))
+    draw.text((left + 20, top + 30), "Save changes before closing?", fill=(38, 50, 56))
+    draw.rectangle((left + 280, top + 110, left + 380, top + 140), fill=(74, 107, 175))
+    return image
+
+
+def make_table(width, height):
+    """A dense spreadsheet-like grid of small numbers"""
+    image = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for y in range(0, height, 14):
+        draw.line((0, y, width, y), fill=(200, 200, 200))
+        for x in range(0, width, 56):
+            draw.text((x + 3, y + 2), f"{(x * 7 + y * 13) % 99991:5d}", fill=(20, 20, 20))
+    for x in range(0, width, 56):
+        draw.line((x, 0, x, height), fill=(200, 200, 200))
+    return image
+
+
+def make_photo(width, height):
+    """A photo-like image: smooth gradients plus sensor noise"""
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 24)
+    return Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+
+
+IMAGES = {"dialog": make_dialog, "form": make_screen, "table": make_table, "photo": make_photo}
+
+
+def run(encoder, image, repeat):
+    """(upload size, bytes, prepare ms, encode ms) as medians over repeat runs"""
+    prepare, encode = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        upload_image, profile = encoder.prepare_upload(image)
+        prepare.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        upload_bytes, _, upload_size = encoder.encode_upload_image(upload_image, profile)
+        encode.append((time.perf_counter() - start) * 1000)
+    return upload_size, len(upload_bytes), statistics.median(prepare), statistics.median(encode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=["1080p", "4k"])
+    parser.add_argument("--images", nargs="+", choices=list(IMAGES), default=list(IMAGES))
+    parser.add_argument("--format", default="png")
+    parser.add_argument("--budget-kb", type=float, default=None)
+    parser.add_argument("--token-budget", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fixed = CaptureEncoder(upload_format=args.format)
+    byte_budget = args.budget_kb * 1024 if args.budget_kb else None
+    for name in args.resolutions:
+        for kind in args.images:
+            image = IMAGES[kind](*RESOLUTIONS[name])
+            density, flat = content_profile(image)
+            print(f"{name} {kind}: edge density {density:.3f}, {'flat' if flat else 'many colours'}")
+            # A fresh adaptive encoder per image, so the byte model starts from its prior
+            adaptive = CaptureEncoder(upload_format=args.format, adaptive=True, byte_budget=byte_budget,
+                                      token_budget=args.token_budget)
+            for label, encoder in (("fixed 1024", fixed), ("adaptive", adaptive)):
+                (width, height), size, prepare_ms, encode_ms = run(encoder, image, args.repeat)
+                print(f"  {label:<11} {width:>4}x{height:<4} {size / 1024:8.1f} KB  "
+                      f"~{width * height / PIXELS_PER_TOKEN:6.0f} tokens  "
+                      f"prepare={prepare_ms:6.1f} ms  encode={encode_ms:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Upload size and preprocess+encode time of delta captures vs. full frames.
+
+Simulates an operator re-capturing the same form while filling in a few
+fields: each frame changes a handful of fields of the previous one. The
+full path encodes the whole downscaled frame every time; delta mode
+encodes only the bounding box of changed tiles (with a keyframe every
+--keyframe-interval captures).
+
+    python benchmarks/bench_delta.py --frames 30
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import ImageDraw
+
+from bench_encode import make_screen
+from capture_active_window import TileDeltaTracker, encode_image, resize_for_upload
+
+
+def edit_fields(image, rng, fields=3):
+    """Type new text into a few form fields near each other"""
+    image = image.copy()
+    draw = ImageDraw.Draw(image)
+    y = rng.randrange(80, image.height - 200, 36)
+    for i in range(fields):
+        x = rng.randint(40, image.width // 3)
+        draw.rectangle((x, y + 36 * i, x + 240, y + 36 * i + 24), fill=(255, 255, 255), outline=(180, 185, 195))
+        draw.text((x + 6, y + 36 * i + 6), f"value {rng.randint(0, 99999)}", fill=(38, 50, 56))
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--width", type=int, default=2560)
+    parser.add_argument("--height", type=int, default=1440)
+    parser.add_argument("--keyframe-interval", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    frames = [make_screen(args.width, args.height)]
+    for _ in range(args.frames - 1):
+        frames.append(edit_fields(frames[-1], rng))
+
+    tracker = TileDeltaTracker(keyframe_interval=args.keyframe_interval)
+    totals = {"full": [0, 0.0], "delta": [0, 0.0]}
+    for frame in frames:
+        start = time.perf_counter()
+        upload = resize_for_upload(frame)
+        encoded = encode_image(upload)
+        totals["full"][0] += len(encoded)
+        totals["full"][1] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        upload = resize_for_upload(frame)
+        delta = tracker.diff(("form", (0, 0, args.width, args.height)), upload)
+        if delta is None or delta["box"] is not None:
+            if delta is not None:
+                x, y, width, height = delta["box"]
+                upload = upload.crop((x, y, x + width, y + height))
+            totals["delta"][0] += len(encode_image(upload))
+        totals["delta"][1] += time.perf_counter() - start
+
+    print(f"{args.frames} captures of a {args.width}x{args.height} form, keyframe every {args.keyframe_interval}")
+    for mode, (size, seconds) in totals.items():
+        print(f"  {mode:<6} upload={size / args.frames / 1024:8.1f} KB/capture  "
+              f"preprocess+encode={seconds / args.frames * 1000:7.1f} ms/capture")
+    print(f"  {tracker.delta_frames} delta frames, {tracker.keyframes} keyframes, "
+          f"{tracker.unchanged_frames} unchanged, "
+          f"{1 - tracker.sent_pixels / tracker.full_pixels:.0%} pixels not sent")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Per-stage timing comparison of the capture encode path.
+
+Compares the old path (full-res PNG save, PNG encode + reopen inside
+compress_image, second optimized PNG encode for base64) with the single
+CaptureEncoder stage for each upload format and optimisation level, on
+synthetic application-window images at common monitor resolutions.
+
+    python benchmarks/bench_encode.py --repeat 3
+"""
+import argparse
+import base64
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+from capture_active_window import OPTIMIZE_LEVELS, CaptureEncoder, resize_for_upload
+
+RESOLUTIONS = {"1080p": (1920, 1080), "1440p": (2560, 1440), "4k": (3840, 2160)}
+
+
+def make_screen(width, height, seed=0):
+    """Draw a flat, form-like application window: panels, fields and text"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), (245, 247, 250))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, 48), fill=(74, 107, 175))
+    for y in range(80, height - 40, 36):
+        x = 40
+        while x < width - 200:
+            field = rng.randint(80, 320)
+            draw.rectangle((x, y, x + field, y + 24), outline=(180, 185, 195), fill=(255, 255, 255))
+            draw.text((x + 6, y + 6), "".join(rng.choice("ABCDEFGHIJ0123456789 ") for _ in range(field // 8)),
+                      fill=(38, 50, 56))
+            x += field + rng.randint(20, 60)
+    return image
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def legacy_path(image, path):
+    stages = {}
+    _, stages["save_full_png"] = timed(lambda: image.save(path, quality=95))
+
+    def compress():
+        resized = resize_for_upload(image)
+        output = BytesIO()
+        resized.save(output, format="PNG", optimize=True, quality=100)
+        output.seek(0)
+        reopened = Image.open(output)
+        reopened.load()
+        return reopened
+    compressed, stages["compress_image"] = timed(compress)
+
+    def encode():
+        output = BytesIO()
+        compressed.save(output, format="PNG", optimize=True)
+        return output.getvalue()
+    encoded, stages["encode_upload"] = timed(encode)
+    _, stages["base64"] = timed(lambda: base64.b64encode(encoded))
+    return stages, len(encoded)
+
+
+def encoder_path(encoder, image, base_path):
+    (_, encoded, stages), _ = timed(lambda: encoder.encode(image, base_path))
+    _, stages["base64"] = timed(lambda: base64.b64encode(encoded))
+    return stages, len(encoded)
+
+
+def report(label, runs, sizes):
+    stages = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+    total = sum(stages.values())
+    detail = "  ".join(f"{name}={ms:.1f}" for name, ms in stages.items())
+    print(f"  {label:<32} total={total:8.1f} ms  upload={sizes[0] / 1024:7.1f} KB  {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quality", type=int, default=85)
+    args = parser.parse_args()
+
+    out_dir = tempfile.mkdtemp(prefix="bench_encode_")
+    configs = [("png", "png", level) for level in OPTIMIZE_LEVELS]
+    configs += [("webp-lossless", "webp-lossless", "fast"), ("webp", "png", "fast"),
+                ("jpeg", "png", "fast"), ("webp", "webp", "default")]
+
+    for name in args.resolutions:
+        image = make_screen(*RESOLUTIONS[name])
+        print(f"{name} {image.width}x{image.height} (median of {args.repeat}, ms)")
+
+        runs, sizes = [], []
+        for _ in range(args.repeat):
+            stages, size = legacy_path(image, os.path.join(out_dir, "legacy.png"))
+            runs.append(stages)
+            sizes.append(size)
+        report("legacy (3x png)", runs, sizes)
+
+        for upload_format, archive_format, level in configs:
+            encoder = CaptureEncoder(upload_format, archive_format, args.quality, level)
+            runs, sizes = [], []
+            for _ in range(args.repeat):
+                stages, size = encoder_path(encoder, image, os.path.join(out_dir, "capture"))
+                runs.append(stages)
+                sizes.append(size)
+            report(f"{upload_format}/{archive_format} {level}", runs, sizes)
+
+
+if __name__ == "__main__":
+    main()
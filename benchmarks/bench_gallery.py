@@ -0,0 +1,93 @@
+"""Benchmark the per-capture UI cost of adding a card to the gallery.
+
+Runs the real ScreenshotApp against synthetic captures (no window query,
+grab or API call) and reports how long each new card takes to build as
+the gallery grows. With incremental updates the cost should stay flat;
+--rebuild emulates the old destroy-and-rebuild path for comparison.
+
+    python benchmarks/bench_gallery.py --captures 150
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from capture_active_window import CaptureRecord, ScreenshotApp
+
+RESPONSE = "\n".join(
+    ["# Inspector's Notes", "", "- **Engine**: V8, *no leaks*", "- See [report](x)"]
+    + [f"Line {i} with **bold** and *italic* text" for i in range(20)]
+)
+
+
+def make_capture(app, i, size):
+    image = Image.new("RGB", size, ((i * 37) % 256, (i * 91) % 256, 128))
+    path = os.path.join(app.temp_dir, f"bench_{i}.png")
+    image.save(path)
+    app.image_cache.put(path, image)
+    return CaptureRecord(
+        title=f"Window {i}",
+        timestamp=time.strftime("%H:%M:%S"),
+        path=path,
+        width=image.width,
+        height=image.height,
+        api_response=RESPONSE,
+    )
+
+
+def rebuild_all(app):
+    for widget in app.screenshots_container.winfo_children():
+        widget.destroy()
+    app.screenshot_cards = []
+    for i in range(len(app.screenshots)):
+        app.add_screenshot_to_ui(i)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--captures", type=int, default=150)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--rebuild", action="store_true",
+                        help="emulate the old full teardown and rebuild per capture")
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    app = ScreenshotApp(root)
+    app.temp_dir = tempfile.mkdtemp(prefix="bench_gallery_")
+    app.button_window.withdraw()
+    root.update()
+
+    timings = []
+    for i in range(args.captures):
+        app.screenshots.insert(0, make_capture(app, i, (args.width, args.height)))
+        start = time.perf_counter()
+        if args.rebuild:
+            rebuild_all(app)
+        else:
+            app.add_screenshot_to_ui(0)
+        root.update_idletasks()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    mode = "rebuild" if args.rebuild else "incremental"
+    print(f"mode={mode} captures={args.captures} size={args.width}x{args.height}")
+    step = max(1, args.captures // 10)
+    for n in range(step, args.captures + 1, step):
+        window = timings[max(0, n - step):n]
+        print(f"  captures {n - len(window) + 1:4d}-{n:4d}: "
+              f"mean {statistics.mean(window):8.2f} ms/capture")
+    print(f"first={timings[0]:.2f} ms last={timings[-1]:.2f} ms "
+          f"total={sum(timings) / 1000:.2f} s")
+    print(app.memory_usage_report())
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
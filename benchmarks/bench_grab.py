@@ -0,0 +1,59 @@
+"""Frames/sec and ms/capture of each registered screen grab backend.
+
+Besides a fixed region and the full desktop, the first monitor reported
+by RandR is grabbed, as the full-screen fallback now does. Needs an X
+display, e.g.:
+
+    xvfb-run -a -s "-screen 0 3840x2160x24" python benchmarks/bench_grab.py --frames 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_active_window import GRAB_BACKENDS, X11WindowQuery
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--region", type=int, nargs=4, metavar=("X", "Y", "W", "H"),
+                        default=(100, 100, 1280, 720))
+    parser.add_argument("--backends", nargs="+", choices=list(GRAB_BACKENDS), default=list(GRAB_BACKENDS))
+    args = parser.parse_args()
+
+    regions = [("region", tuple(args.region)), ("full", None)]
+    try:
+        query = X11WindowQuery()
+        monitors = query.monitors()
+        query.close()
+        print(f"{len(monitors)} monitor(s): {monitors}")
+        regions.append(("monitor", monitors[0]))
+    except OSError as e:
+        print(f"Monitor layout unavailable: {e}")
+
+    for name in args.backends:
+        try:
+            grabber = GRAB_BACKENDS[name]()
+        except Exception as e:
+            print(f"{name:<10} unavailable: {e}")
+            continue
+        for label, region in regions:
+            grabber.grab(region)  # warm up (e.g. allocate the shm segment)
+            timings = []
+            for _ in range(args.frames):
+                start = time.perf_counter()
+                image = grabber.grab(region)
+                timings.append((time.perf_counter() - start) * 1000)
+            mean = statistics.mean(timings)
+            print(f"{name:<10} {label:<7} {image.width}x{image.height}  "
+                  f"{mean:7.2f} ms/capture  p50={statistics.median(timings):7.2f} ms  "
+                  f"{1000 / mean:7.1f} fps")
+        grabber.close()
+
+
+if __name__ == "__main__":
+    main()
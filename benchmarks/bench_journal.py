@@ -0,0 +1,87 @@
+"""Caller-side time and disk bytes of recording each request.
+
+Compares the old path, which streamed the whole request body (the base64
+image twice) over payload.json on the upload thread, with PayloadJournal,
+which queues a compact record referencing the image by path and hash and
+writes it in the background. Inline mode (image embedded once) is shown
+for comparison.
+
+    python benchmarks/bench_journal.py --captures 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_encode import RESOLUTIONS, make_screen
+from capture_active_window import CaptureEncoder, PayloadJournal, StreamingPayload
+
+
+def rewrite_payload_file(path, payload):
+    """The old save_payload_to_file: stream the body to a temp file and swap it in"""
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        payload.write_to(f)
+    os.replace(temp_path, path)
+
+
+def journal_record(i, archive_path, upload_bytes):
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "session_id": f"bench-{i}",
+        "window_title": "Bench window",
+        "image": {"path": archive_path, "mime_type": "image/png"},
+        "upload_bytes": upload_bytes,
+        "assistant_message": "Stub response from the local backend.",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--captures", type=int, default=50)
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=["1080p", "4k"])
+    parser.add_argument("--fsync", choices=("never", "batch", "always"), default="batch")
+    args = parser.parse_args()
+
+    out_dir = tempfile.mkdtemp(prefix="bench_journal_")
+    encoder = CaptureEncoder()
+    for name in args.resolutions:
+        image = make_screen(*RESOLUTIONS[name])
+        encoded = encoder.encode_upload(image)
+        payload = StreamingPayload(encoded, encoder.upload_mime, "bench")
+        archive_path = os.path.join(out_dir, "capture.png")
+        print(f"{name}: upload {len(encoded) / 1024:.0f} KB, request body {len(payload) / 1024:.0f} KB, "
+              f"{args.captures} captures, fsync={args.fsync}")
+
+        path = os.path.join(out_dir, "payload.json")
+        timings = []
+        for _ in range(args.captures):
+            start = time.perf_counter()
+            rewrite_payload_file(path, payload)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"  rewrite payload.json   caller p50={statistics.median(timings):7.3f} ms  "
+              f"written {len(payload) * args.captures / 1024 / 1024:8.2f} MB")
+
+        for inline in (False, True):
+            path = os.path.join(out_dir, f"journal_{name}_{inline}.jsonl")
+            journal = PayloadJournal(path, fsync=args.fsync, inline=inline, max_pending=args.captures)
+            timings = []
+            start_all = time.perf_counter()
+            for i in range(args.captures):
+                start = time.perf_counter()
+                journal.append(journal_record(i, archive_path, len(payload)), encoded)
+                timings.append((time.perf_counter() - start) * 1000)
+            journal.close()
+            drained = (time.perf_counter() - start_all) * 1000
+            label = "journal (inline)" if inline else "journal"
+            print(f"  {label:<22} caller p50={statistics.median(timings):7.3f} ms  "
+                  f"written {journal.bytes_written / 1024 / 1024:8.2f} MB  "
+                  f"(background writer done after {drained:.0f} ms, {journal.dropped} dropped)")
+
+
+if __name__ == "__main__":
+    main()
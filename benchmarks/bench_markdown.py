@@ -0,0 +1,141 @@
+"""Benchmark Markdown rendering of large backend responses.
+
+Builds a ~100 KB response (headings, bullets, long table rows, code
+blocks and inline bold/italic/links) and times the single-pass tokenizer
+and MarkdownText.insert_markdown against the old per-fragment path,
+which re-ran three uncompiled searches per token and inserted each
+fragment separately. Render timings need a display and are skipped
+without one.
+
+    python benchmarks/bench_markdown.py --size-kb 100 --repeat 5
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_active_window import MarkdownText, markdown_segments
+
+
+def make_response(size_kb):
+    """A Markdown response of roughly size_kb kilobytes"""
+    parts = []
+    i = 0
+    while sum(len(part) for part in parts) < size_kb * 1024:
+        parts.append(f"## Section {i}\n")
+        parts.append(f"- **Item {i}**: *value* with [link](https://example.com/{i})\n")
+        row = " | ".join(f"**c{j}** *v{j}*" for j in range(20))
+        parts.append(f"| {row} |\n" * 4)
+        parts.append("```\n" + "".join(f"    x_{j} = compute({j})\n" for j in range(8)) + "```\n")
+        parts.append(f"Plain paragraph {i} with **bold**, *italic* and a [ref](u) in the middle.\n\n")
+        i += 1
+    return "".join(parts)
+
+
+def legacy_process_inline(line, sink):
+    line_remaining = line
+    while line_remaining:
+        bold_match = re.search(r'\*\*(.*?)\*\*', line_remaining)
+        italic_match = re.search(r'\*(.*?)\*', line_remaining)
+        link_match = re.search(r'\[(.*?)\]\((.*?)\)', line_remaining)
+        matches = []
+        if bold_match:
+            matches.append(('bold', bold_match.start(), bold_match.end(), bold_match.group(1)))
+        if italic_match:
+            matches.append(('italic', italic_match.start(), italic_match.end(), italic_match.group(1)))
+        if link_match:
+            matches.append(('link', link_match.start(), link_match.end(), link_match.group(1)))
+        if not matches:
+            sink(line_remaining)
+            break
+        matches.sort(key=lambda x: x[1])
+        match_type, start, end, content = matches[0]
+        if start > 0:
+            sink(line_remaining[:start])
+        sink(content, match_type)
+        line_remaining = line_remaining[end:]
+
+
+def legacy_render(text, sink):
+    """The old line loop, calling sink(chars, tag) once per fragment"""
+    code_block = False
+    for line in text.split('\n'):
+        if line.strip().startswith('```'):
+            code_block = not code_block
+            if not code_block:
+                sink('\n')
+            continue
+        if code_block:
+            sink(line + '\n', "code")
+            continue
+        if line.strip().startswith('# '):
+            sink(line[2:] + '\n', "heading1")
+            continue
+        elif line.strip().startswith('## '):
+            sink(line[3:] + '\n', "heading2")
+            continue
+        elif line.strip().startswith('### '):
+            sink(line[4:] + '\n', "heading3")
+            continue
+        if line.strip().startswith('- ') or line.strip().startswith('* '):
+            sink('• ' + line[2:].strip() + '\n', "bullet")
+            continue
+        legacy_process_inline(line, sink)
+        sink('\n')
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-kb", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = make_response(args.size_kb)
+    print(f"Response: {len(text) / 1024:.0f} KB, {text.count(chr(10))} lines")
+
+    fragments = []
+    legacy_ms = timed(lambda: (fragments.clear(), legacy_render(text, lambda *a: fragments.append(a))), args.repeat)
+    segments = markdown_segments(text)
+    tokenize_ms = timed(lambda: markdown_segments(text), args.repeat)
+    print(f"Tokenize, legacy:       {legacy_ms:8.1f} ms ({len(fragments)} inserts)")
+    print(f"Tokenize, single pass:  {tokenize_ms:8.1f} ms ({len(segments)} segments, 1 insert)")
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Render timings skipped: {e}")
+        return
+    widget = MarkdownText(root, wrap=tk.WORD, width=70, height=20)
+    widget.pack()
+    root.update()
+
+    def render_legacy():
+        widget.delete(1.0, tk.END)
+        legacy_render(text, lambda chars, tag=None: widget.insert(tk.END, chars, tag))
+        root.update_idletasks()
+
+    def render_bulk():
+        widget.insert_markdown(text)
+        root.update_idletasks()
+
+    print(f"Render, legacy:         {timed(render_legacy, args.repeat):8.1f} ms")
+    print(f"Render, bulk insert:    {timed(render_bulk, args.repeat):8.1f} ms")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
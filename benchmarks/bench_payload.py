@@ -0,0 +1,82 @@
+"""Peak memory and time of building, uploading and saving one request payload.
+
+Compares the old path (base64 data URI embedded twice in a dict,
+serialized by requests and again by json.dump(indent=2)) with
+StreamingPayload, which streams both to the stub backend and to disk
+from the encoded bytes. Peak Python allocations are measured with
+tracemalloc around each path.
+
+    python benchmarks/bench_payload.py --encoded-mb 4
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from capture_active_window import CAPTURE_PROMPT, ApiTransport, StreamingPayload
+from stub_backend import start_stub_server
+
+
+def legacy_path(encoded, url, payload_file):
+    img_str = f"data:image/png;base64,{base64.b64encode(encoded).decode()}"
+    payload_json = {
+        "session_id": "bench",
+        "user_message": {"type": "image", "image": [img_str]},
+        "conversation_history": [{
+            "role": "user",
+            "content": CAPTURE_PROMPT,
+            "attachments": [{"type": "file", "base64String": [img_str]}],
+        }],
+    }
+    response = requests.post(url, json=payload_json, headers={"Content-Type": "application/json"})
+    response.raise_for_status()
+    with open(payload_file, "w") as f:
+        json.dump(payload_json, f, indent=2)
+
+
+def streaming_path(encoded, transport, payload_file):
+    payload = StreamingPayload(encoded, "image/png", "bench")
+    transport.post_json(data=payload)
+    with open(payload_file, "wb") as f:
+        payload.write_to(f)
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<18} peak={peak / 1024 / 1024:8.2f} MB  time={elapsed:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--encoded-mb", type=float, default=4.0,
+                        help="size of the encoded upload image")
+    args = parser.parse_args()
+
+    server, url = start_stub_server()
+    transport = ApiTransport(url)
+    encoded = os.urandom(int(args.encoded_mb * 1024 * 1024))
+    payload_file = os.path.join(tempfile.mkdtemp(prefix="bench_payload_"), "payload.json")
+
+    print(f"encoded image {args.encoded_mb} MB")
+    measure("legacy dict", lambda: legacy_path(encoded, url, payload_file))
+    measure("streaming", lambda: streaming_path(encoded, transport, payload_file))
+    print(f"  stub received {server.bytes_received / 1024 / 1024:.2f} MB over {server.requests} requests")
+    transport.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
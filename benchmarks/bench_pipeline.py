@@ -0,0 +1,365 @@
+"""Per-stage and end-to-end benchmark of the capture-to-response path.
+
+Runs every stage of a capture on synthetic application-window images at
+1080p, 1440p and 4K against the local stub /v1/chat backend, then the
+whole path sequentially and through a CapturePipeline. For each it reports
+p50/p95/p99 latency, throughput and the peak process RSS seen while it
+ran, and writes everything to a JSON file so runs can be compared across
+versions. Window query, grab and widget rendering need an X display;
+without one they are skipped (render then covers tokenizing and the
+thumbnail only). Run it headless under Xvfb:
+
+    xvfb-run -a -s "-screen 0 3840x2160x24" python benchmarks/bench_pipeline.py --output base.json
+    python benchmarks/bench_pipeline.py --output new.json --compare base.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from bench_encode import RESOLUTIONS, make_screen
+from capture_active_window import (
+    CAPTURE_PROMPT, ApiTransport, CaptureEncoder, CaptureJob, CapturePipeline, PayloadJournal, PipelineStage,
+    ResponseCache, StreamingPayload, X11WindowQuery, create_grabber, get_process_rss, markdown_segments,
+    perceptual_hash, resize_for_upload
+)
+from stub_backend import ASSISTANT_MESSAGE, start_stub_server
+
+
+class PeakRss:
+    """Sample the process RSS in a background thread while a block runs"""
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, get_process_rss() or 0)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = get_process_rss() or 0
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, get_process_rss() or 0)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(samples_ms, elapsed, rss_peak):
+    ordered = sorted(samples_ms)
+    return {
+        "samples": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(percentile(ordered, 0.95), 3),
+        "p99_ms": round(percentile(ordered, 0.99), 3),
+        "mean_ms": round(statistics.mean(ordered), 3),
+        "throughput_per_s": round(len(ordered) / elapsed, 2) if elapsed else None,
+        "peak_rss_mb": round(rss_peak / (1024 * 1024), 1),
+    }
+
+
+def measure(func, repeat, warmup=1):
+    """Time func() repeat times (after warmup calls); returns its summary"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            call_start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - call_start) * 1000)
+        elapsed = time.perf_counter() - start
+    return summarize(samples, elapsed, rss.peak)
+
+
+class Display:
+    """The X11 and Tk pieces of a capture, or None for each that is unavailable"""
+    def __init__(self):
+        self.query = self.grabber = self.root = self.text = None
+        try:
+            self.query = X11WindowQuery()
+        except OSError:
+            pass
+        try:
+            self.grabber = create_grabber("auto")
+            self.grabber.grab((0, 0, 8, 8))
+        except Exception:
+            self.grabber = None
+        try:
+            import tkinter as tk
+
+            from capture_active_window import MarkdownText
+            self.root = tk.Tk()
+            self.text = MarkdownText(self.root, wrap=tk.WORD, width=70, height=20)
+            self.text.pack()
+            self.root.update()
+        except Exception:
+            self.root = None
+
+    def render(self, thumbnail, response):
+        from PIL import ImageTk
+
+        photo = ImageTk.PhotoImage(thumbnail)
+        self.text.insert_markdown(response)
+        self.root.update_idletasks()
+        return photo
+
+    def close(self):
+        for resource in (self.query, self.grabber):
+            if resource is not None:
+                resource.close()
+        if self.root is not None:
+            self.root.destroy()
+
+
+class CaptureBench:
+    """The capture stages as standalone functions, sharing one stub, transport and encoder"""
+    def __init__(self, url, out_dir, display, response):
+        self.transport = ApiTransport(url)
+        self.encoder = CaptureEncoder()
+        self.out_dir = out_dir
+        self.display = display
+        self.response = response
+        self.journal = PayloadJournal(os.path.join(out_dir, "payload_journal.jsonl"), max_pending=1024)
+
+    def window_query(self):
+        return self.display.query.active_window_info()
+
+    def grab(self, size):
+        return self.display.grabber.grab((0, 0) + size)
+
+    def resize(self, image):
+        return resize_for_upload(image, self.encoder.max_size)
+
+    def phash(self, upload_image):
+        return perceptual_hash(upload_image)
+
+    def encode(self, image, upload_image):
+        base = os.path.join(self.out_dir, f"capture_{uuid.uuid4().hex}")
+        archive_path, encoded, _ = self.encoder.encode_prepared(image, upload_image, base)
+        os.remove(archive_path)
+        return encoded
+
+    def serialize(self, encoded):
+        payload = StreamingPayload(encoded, self.encoder.upload_mime, "bench")
+        while payload.read(1 << 16):
+            pass
+        return payload
+
+    def cache_key(self, encoded):
+        return ResponseCache.key(encoded, CAPTURE_PROMPT, self.transport.url)
+
+    def upload(self, payload):
+        return self.transport.post_json(data=payload).get("assistant_message")
+
+    def journal_payload(self, payload, encoded):
+        record = {"session_id": "bench", "image": {"path": "capture.png"}, "upload_bytes": len(payload)}
+        self.journal.append(record, encoded)
+
+    def render(self, image, response):
+        ratio = min(600 / image.width, 1.0)
+        thumbnail = image.resize((int(image.width * ratio), int(image.height * ratio)), Image.LANCZOS)
+        if self.display.root is not None:
+            return self.display.render(thumbnail, response)
+        return markdown_segments(response)
+
+    def full(self, image):
+        """One capture through every stage, in order, on this thread"""
+        if self.display.query is not None:
+            self.window_query()
+        upload_image = self.resize(image)
+        self.phash(upload_image)
+        encoded = self.encode(image, upload_image)
+        self.cache_key(encoded)
+        payload = self.serialize(encoded)
+        response = self.upload(payload)
+        self.journal_payload(payload, encoded)
+        self.render(image, response)
+
+    def close(self):
+        self.transport.close()
+        self.journal.close()
+
+
+def run_pipelined(bench, image, jobs):
+    """Push jobs captures through a CapturePipeline; returns per-job latency and wall time"""
+    latencies = []
+    finished = threading.Event()
+    lock = threading.Lock()
+
+    def preprocess(job):
+        job.upload_image = bench.resize(job.screenshot)
+        job.phash = bench.phash(job.upload_image)
+        return job
+
+    def encode(job):
+        job.encoded = bench.encode(job.screenshot, job.upload_image)
+        return job
+
+    def upload(job):
+        payload = StreamingPayload(job.encoded, bench.encoder.upload_mime, str(uuid.uuid4()))
+        job.result = bench.upload(payload)
+        bench.journal_payload(payload, job.encoded)
+        return job
+
+    def render(job):
+        bench.render(job.screenshot, job.result)
+        with lock:
+            latencies.append((time.perf_counter() - job.submitted_at) * 1000)
+            if len(latencies) == jobs:
+                finished.set()
+
+    def on_error(stage, job, error):
+        print(f"  pipeline error in {stage.name}: {error}")
+        with lock:
+            latencies.append(float("nan"))
+            if len(latencies) == jobs:
+                finished.set()
+
+    # Tk is single-threaded; without a display the render stage could be wider
+    pipeline = CapturePipeline(
+        [
+            PipelineStage("preprocess", preprocess, workers=2),
+            PipelineStage("encode", encode, workers=2),
+            PipelineStage("upload", upload, workers=bench.transport.max_in_flight),
+            PipelineStage("render", render, workers=1),
+        ],
+        on_error=on_error
+    )
+    start = time.perf_counter()
+    for _ in range(jobs):
+        job = CaptureJob()
+        job.screenshot = image
+        job.submitted_at = time.perf_counter()
+        while not pipeline.submit(job):
+            time.sleep(0.001)
+            job.submitted_at = time.perf_counter()
+    finished.wait()
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+    return latencies, elapsed
+
+
+def bench_resolution(bench, name, size, repeat, pipeline_jobs):
+    image = make_screen(*size)
+    results = {}
+    if bench.display.query is not None:
+        results["window_query"] = measure(bench.window_query, repeat)
+    if bench.display.grabber is not None:
+        results["grab"] = measure(lambda: bench.grab(size), repeat)
+    upload_image = bench.resize(image)
+    encoded = bench.encode(image, upload_image)
+    payload = bench.serialize(encoded)
+    results["resize"] = measure(lambda: bench.resize(image), repeat)
+    results["phash"] = measure(lambda: bench.phash(upload_image), repeat)
+    results["encode"] = measure(lambda: bench.encode(image, upload_image), repeat)
+    results["cache_key"] = measure(lambda: bench.cache_key(encoded), repeat)
+    results["serialize"] = measure(lambda: bench.serialize(encoded), repeat)
+    results["upload"] = measure(lambda: bench.upload(payload), repeat)
+    results["journal"] = measure(lambda: bench.journal_payload(payload, encoded), repeat)
+    results["render"] = measure(lambda: bench.render(image, bench.response), repeat)
+    results["full_sequential"] = measure(lambda: bench.full(image), repeat)
+
+    with PeakRss() as rss:
+        latencies, elapsed = run_pipelined(bench, image, pipeline_jobs)
+    results["full_pipelined"] = summarize(latencies, elapsed, rss.peak)
+    for stats in results.values():
+        stats["upload_kb"] = round(len(encoded) / 1024, 1)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "display": os.environ.get("DISPLAY"),
+    }
+
+
+def print_results(name, results, baseline=None):
+    print(f"{name}")
+    for stage, stats in results.items():
+        line = (f"  {stage:<16} p50={stats['p50_ms']:9.2f}  p95={stats['p95_ms']:9.2f}  "
+                f"p99={stats['p99_ms']:9.2f} ms  {stats['throughput_per_s'] or 0:8.1f}/s  "
+                f"peak RSS {stats['peak_rss_mb']:7.1f} MB")
+        old = (baseline or {}).get(stage)
+        if old:
+            change = (stats["p50_ms"] - old["p50_ms"]) / old["p50_ms"] if old["p50_ms"] else 0.0
+            line += f"  p50 {change:+.0%} vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per stage (default: 20)")
+    parser.add_argument("--pipeline-jobs", type=int, default=20,
+                        help="captures pushed through the pipelined run (default: 20)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="stub backend latency (default: 20)")
+    parser.add_argument("--output", default="bench_pipeline.json", help="JSON results file")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results to compare p50s against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    server, url = start_stub_server(latency_ms=args.latency_ms)
+    display = Display()
+    out_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    bench = CaptureBench(url, out_dir, display, ASSISTANT_MESSAGE * 20)
+    skipped = [stage for stage, available in (("window_query", display.query), ("grab", display.grabber),
+                                              ("render widgets", display.root)) if available is None]
+    if skipped:
+        print(f"No usable display: skipping {', '.join(skipped)}")
+
+    report = {"environment": environment(), "settings": vars(args), "skipped": skipped, "results": {}}
+    try:
+        for name in args.resolutions:
+            size = RESOLUTIONS[name]
+            results = bench_resolution(bench, name, size, args.repeat, args.pipeline_jobs)
+            report["results"][name] = results
+            print_results(f"{name} {size[0]}x{size[1]} ({args.repeat} runs per stage, "
+                          f"{args.latency_ms:.0f} ms stub latency)", results, baseline.get(name))
+    finally:
+        bench.close()
+        display.close()
+        server.shutdown()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
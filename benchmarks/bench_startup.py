@@ -0,0 +1,109 @@
+"""Cold-start time: module import, first paint of the floating button, main window.
+
+Every sample runs in a fresh interpreter so nothing is already imported.
+The import probe also lists which heavy modules the import pulled in;
+numpy, requests, asyncio and the process pool should only be loaded by
+the first capture or upload. First-paint timings need a display and are
+skipped without one.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("numpy", "requests", "asyncio", "concurrent.futures.process", "PIL.ImageTk", "pyautogui")
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import capture_active_window
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({"import_ms": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+PAINT_PROBE = """
+import json, sys, tempfile, time
+start = time.perf_counter()
+import tkinter as tk
+from capture_active_window import ScreenshotApp
+imported = time.perf_counter()
+marks = {"import_ms": (imported - start) * 1000}
+
+root = tk.Tk()
+app = ScreenshotApp(root, store_dir=tempfile.mkdtemp(prefix="bench_startup_"),
+                    response_cache_mb=0, journal_max_mb=0)
+marks["init_ms"] = (time.perf_counter() - start) * 1000
+
+def mark(name, widget):
+    def on_event(event):
+        if event.widget is widget and name not in marks:
+            marks[name] = (time.perf_counter() - start) * 1000
+            if "button_paint_ms" in marks and "main_window_map_ms" in marks:
+                root.after_idle(finish)
+    widget.bind("<Expose>" if name == "button_paint_ms" else "<Map>", on_event, add="+")
+
+def finish():
+    print(json.dumps(marks))
+    app.on_close()
+
+mark("button_paint_ms", app.button_window)
+mark("main_window_map_ms", root)
+root.after(10000, finish)
+root.mainloop()
+"""
+
+
+def run_probe(code):
+    """Run code in a fresh interpreter from the repo root; returns (result, wall ms)"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "probe failed")
+    return json.loads(result.stdout.strip().splitlines()[-1]), wall_ms
+
+
+def summarize(label, samples):
+    print(f"  {label:<24} p50={statistics.median(samples):8.1f} ms  min={min(samples):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Import ({args.repeat} fresh interpreters):")
+    imports, walls, loaded = [], [], set()
+    for _ in range(args.repeat):
+        result, wall_ms = run_probe(IMPORT_PROBE % (HEAVY_MODULES,))
+        imports.append(result["import_ms"])
+        walls.append(wall_ms)
+        loaded.update(result["loaded"])
+    summarize("import module", imports)
+    summarize("interpreter + import", walls)
+    print(f"  heavy modules loaded:    {', '.join(sorted(loaded)) or 'none'}")
+
+    print("First paint:")
+    marks = {}
+    try:
+        for _ in range(args.repeat):
+            result, wall_ms = run_probe(PAINT_PROBE)
+            for name, value in result.items():
+                marks.setdefault(name, []).append(value)
+    except RuntimeError as e:
+        print(f"  skipped: {e}")
+        return
+    for name in ("import_ms", "init_ms", "button_paint_ms", "main_window_map_ms"):
+        if name in marks:
+            summarize(name[:-3].replace("_", " "), marks[name])
+
+
+if __name__ == "__main__":
+    main()
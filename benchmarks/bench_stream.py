@@ -0,0 +1,75 @@
+"""Time-to-first-token of streamed answers against the full-response wait.
+
+Runs ApiTransport against the local stub backend, which streams a long
+Markdown answer one word per Server-Sent Event. post_json() waits for the
+whole answer; post_stream() hands over each piece as it arrives, so the
+first text can be shown after the backend's latency plus one token. The
+stub is also run without streaming to check the JSON fallback.
+
+    python benchmarks/bench_stream.py --words 200 --token-delay-ms 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_active_window import ApiTransport, StreamingPayload
+from stub_backend import ASSISTANT_MESSAGE, start_stub_server
+
+
+def time_stream(transport, payload):
+    """Return (first piece ms, total ms, pieces, text) for one streamed request"""
+    start = time.perf_counter()
+    arrivals = []
+    text = transport.post_stream(payload, lambda piece: arrivals.append(time.perf_counter()))
+    total = (time.perf_counter() - start) * 1000
+    first = (arrivals[0] - start) * 1000 if arrivals else total
+    return first, total, len(arrivals), text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--token-delay-ms", type=float, default=10)
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+
+    words = (ASSISTANT_MESSAGE.split(" ") * (args.words // len(ASSISTANT_MESSAGE.split(" ")) + 1))[:args.words]
+    message = " ".join(words)
+    payload = StreamingPayload(b"\x89PNG" * 1000, "image/png", "bench")
+
+    server, url = start_stub_server(latency_ms=args.latency_ms, message=message,
+                                    token_delay_ms=args.token_delay_ms)
+    transport = ApiTransport(url)
+    print(f"{args.words} words, {args.latency_ms:.0f} ms backend latency, "
+          f"{args.token_delay_ms:.0f} ms per token")
+
+    full = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        transport.post_json(data=payload)
+        full.append((time.perf_counter() - start) * 1000)
+    print(f"  post_json (full JSON body)     first text after {statistics.median(full):8.1f} ms")
+
+    runs = [time_stream(transport, payload) for _ in range(args.requests)]
+    assert all(run[3] == message for run in runs), "streamed text differs from the message"
+    print(f"  post_stream (SSE)              first text after {statistics.median(r[0] for r in runs):8.1f} ms, "
+          f"complete after {statistics.median(r[1] for r in runs):8.1f} ms ({runs[0][2]} pieces)")
+    transport.close()
+    server.shutdown()
+
+    server, url = start_stub_server(latency_ms=args.latency_ms, message=message)
+    transport = ApiTransport(url)
+    first, total, pieces, text = time_stream(transport, payload)
+    assert text == message, "JSON fallback text differs from the message"
+    print(f"  post_stream (JSON fallback)    first text after {first:8.1f} ms ({pieces} piece)")
+    transport.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Request latency and sustained throughput of the backend transport.
+
+Runs against the local stub backend and compares the old per-call
+requests.post (no Session, new connection each time) with the pooled
+ApiTransport, sequentially and from concurrent upload workers. The
+asyncio AsyncApiTransport is included when aiohttp is installed.
+
+    python benchmarks/bench_transport.py --requests 500 --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from capture_active_window import ApiTransport, AsyncApiTransport
+from stub_backend import start_stub_server
+
+PAYLOAD = {
+    "session_id": "bench",
+    "user_message": {"type": "image", "image": ["data:image/png;base64," + "A" * 200_000]},
+}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def report(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    print(f"  {label:<32} p50={statistics.median(latencies):7.2f} ms  "
+          f"p99={percentile(latencies, 0.99):7.2f} ms  {len(latencies) / elapsed:8.1f} req/s")
+
+
+def run_threads(call, count, concurrency):
+    def timed_call(_):
+        start = time.perf_counter()
+        call()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(timed_call, range(count)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_async(url, count, concurrency):
+    latencies = []
+    async with AsyncApiTransport(url, max_in_flight=concurrency) as transport:
+        async def worker(calls):
+            for _ in range(calls):
+                start = time.perf_counter()
+                await transport.post_json(PAYLOAD)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(count // concurrency) for _ in range(concurrency)))
+        return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="artificial backend latency per request")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(latency_ms=args.latency_ms)
+
+    def legacy_call():
+        response = requests.post(url, json=PAYLOAD, headers={"Content-Type": "application/json"})
+        response.raise_for_status()
+        return response.json()
+
+    transport = ApiTransport(url, max_in_flight=args.concurrency)
+    print(f"{args.requests} requests, stub latency {args.latency_ms} ms")
+    for concurrency in (1, args.concurrency):
+        report(f"requests.post x{concurrency}", *run_threads(legacy_call, args.requests, concurrency))
+        report(f"ApiTransport x{concurrency}", *run_threads(
+            lambda: transport.post_json(PAYLOAD), args.requests, concurrency))
+        try:
+            report(f"AsyncApiTransport x{concurrency}",
+                   *asyncio.run(run_async(url, args.requests, concurrency)))
+        except ImportError as e:
+            print(f"  AsyncApiTransport skipped: {e}")
+    transport.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
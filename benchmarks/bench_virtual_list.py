@@ -0,0 +1,87 @@
+"""Benchmark startup and scrolling of the virtualized screenshot list.
+
+Fills a ScreenshotApp running with virtual_list=True with synthetic
+capture records (a handful of image files shared between them), then
+reports how long the initial layout takes and the per-step cost of
+scrolling through the whole list, along with how many card widgets
+were ever created.
+
+    python benchmarks/bench_virtual_list.py --entries 5000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from capture_active_window import CaptureRecord, ScreenshotApp
+
+RESPONSE = "\n".join(
+    ["# Inspector's Notes", "", "- **Engine**: V8, *no leaks*"]
+    + [f"Line {i} with **bold** and *italic* text" for i in range(20)]
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--images", type=int, default=20,
+                        help="distinct image files shared by the entries")
+    parser.add_argument("--steps", type=int, default=500,
+                        help="scroll positions visited from top to bottom")
+    args = parser.parse_args()
+
+    image_dir = tempfile.mkdtemp(prefix="bench_virtual_list_")
+    paths = []
+    for i in range(args.images):
+        path = os.path.join(image_dir, f"capture_{i}.png")
+        Image.new("RGB", (1280, 720 + 10 * i), (i * 12 % 256, 90, 160)).save(path)
+        paths.append((path, 1280, 720 + 10 * i))
+
+    root = tk.Tk()
+    app = ScreenshotApp(root, virtual_list=True)
+    app.button_window.withdraw()
+    root.update()
+
+    for i in range(args.entries):
+        path, width, height = paths[i % len(paths)]
+        app.screenshots.append(CaptureRecord(f"Window {i}", "12:00:00", path, width, height,
+                                             api_response=RESPONSE))
+
+    start = time.perf_counter()
+    app.gallery.relayout()
+    root.update()
+    startup_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    app.screenshots.insert(0, CaptureRecord("New", "12:00:01", paths[0][0], paths[0][1], paths[0][2],
+                                            api_response=RESPONSE))
+    app.add_screenshot_to_ui(0)
+    root.update()
+    insert_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for step in range(args.steps + 1):
+        start = time.perf_counter()
+        app.canvas.yview_moveto(step / args.steps)
+        root.update()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    print(f"entries={len(app.screenshots)} startup={startup_ms:.1f} ms insert={insert_ms:.1f} ms")
+    print(f"scroll step: p50={statistics.median(timings):.2f} ms "
+          f"p99={timings[int(len(timings) * 0.99) - 1]:.2f} ms max={timings[-1]:.2f} ms")
+    print(f"card widgets created={app.gallery.widget_count()} "
+          f"thumbnails cached={len(app.gallery.thumbnails)}")
+    print(app.memory_usage_report())
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
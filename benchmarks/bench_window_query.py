@@ -0,0 +1,45 @@
+"""Active-window query cost: in-process Xlib vs. three xdotool spawns.
+
+Needs an X display with an EWMH window manager (so _NET_ACTIVE_WINDOW is
+set) and xdotool on PATH, e.g.:
+
+    xvfb-run -a sh -c 'openbox & sleep 1; xterm & sleep 1; python benchmarks/bench_window_query.py'
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_active_window import ScreenshotApp, X11WindowQuery
+
+
+def bench(label, query, runs):
+    timings = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = query()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"  {label:<10} p50={statistics.median(timings):8.3f} ms  "
+          f"p99={timings[min(len(timings) - 1, int(len(timings) * 0.99))]:8.3f} ms  -> {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    x11_query = X11WindowQuery()
+    print(f"{args.runs} queries of the active window")
+    bench("xlib", x11_query.active_window_info, args.runs)
+    # get_window_info_xdotool doesn't touch app state, so no Tk is needed
+    bench("xdotool", lambda: ScreenshotApp.get_window_info_xdotool(None), args.runs)
+    x11_query.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Local stub of the /v1/chat backend for benchmarks.
+
+Speaks HTTP/1.1 with keep-alive, reads and discards the request body and
+answers with a fixed assistant_message after an optional delay. With a
+token delay set, requests that accept text/event-stream get the message
+as chunked Server-Sent Events instead, one word per event. Import
+start_stub_server() from a benchmark, or run it on its own:
+
+    python benchmarks/stub_backend.py --port 8001 --latency-ms 50 --token-delay-ms 20
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ASSISTANT_MESSAGE = (
+    "## Inspector's Notes\n\n- **Engine**: inline 4, no visible leaks\n"
+    "- *Coolant* topped up\n\n### Engine description\n\nStub response from the local backend."
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        remaining = length
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 1 << 16))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        self.server.requests += 1
+        self.server.bytes_received += length
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.token_delay is not None:
+            if "text/event-stream" in self.headers.get("Accept", ""):
+                self.stream_events()
+                return
+            # The answer is generated at the same pace; a JSON client just sees none of it early
+            time.sleep(self.server.token_delay * len(self.server.message.split(" ")))
+        body = json.dumps({"assistant_message": self.server.message}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = self.server.message.split(" ")
+        for i, word in enumerate(words):
+            text = word if i == len(words) - 1 else word + " "
+            self.write_chunk(f"data: {json.dumps({'delta': text})}\n\n".encode())
+            time.sleep(self.server.token_delay)
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+def start_stub_server(host="127.0.0.1", port=0, latency_ms=0.0, message=ASSISTANT_MESSAGE,
+                      token_delay_ms=None):
+    """Start the stub in a background thread; returns (server, url).
+    
+    token_delay_ms=None disables streaming; the stub then always answers JSON.
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000
+    server.message = message
+    server.token_delay = token_delay_ms / 1000 if token_delay_ms is not None else None
+    server.requests = 0
+    server.bytes_received = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1/chat"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--token-delay-ms", type=float, default=None,
+                        help="stream answers as SSE with this delay between words")
+    args = parser.parse_args()
+    server, url = start_stub_server(args.host, args.port, args.latency_ms,
+                                    token_delay_ms=args.token_delay_ms)
+    print(f"Stub backend listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
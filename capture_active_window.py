@@ -1,21 +1,2198 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext
-import pyautogui
 import time
 import os
 import platform
 import tempfile
 import threading
+import queue
 import base64
-from PIL import Image, ImageTk
+from PIL import Image
 from io import BytesIO
 from datetime import datetime
 import json
 import uuid
-import requests
+import hashlib
+import sqlite3
 import re
+import random
+import ctypes
+from contextlib import contextmanager
+import sys
+import bisect
+import glob
+import traceback
+from collections import OrderedDict, deque
+from functools import lru_cache
 from itertools import cycle
 
+
+def get_process_rss():
+    """Return the resident set size of this process in bytes, or None if unknown"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == 'Darwin' else peak * 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+def user_cache_dir():
+    """Per-user cache directory for this app (not created here)"""
+    if platform.system() == 'Windows':
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif platform.system() == 'Darwin':
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "taro")
+
+
+# Encode formats: name -> (PIL format, MIME type, file extension)
+IMAGE_FORMATS = {
+    "png": ("PNG", "image/png", ".png"),
+    "webp-lossless": ("WEBP", "image/webp", ".webp"),
+    "webp": ("WEBP", "image/webp", ".webp"),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+}
+OPTIMIZE_LEVELS = ("fast", "default", "max")
+# Formats that can carry a palette image without further loss
+PALETTE_FORMATS = ("png", "webp-lossless")
+# Adaptive upload sizing (see CaptureEncoder): edge density at which content
+# counts as fully dense, the floor used when predicting bytes for sparse
+# content, and the image pixels a vision model bills as one token
+DENSE_EDGE_DENSITY = 0.15
+MIN_EDGE_DENSITY = 0.01
+PIXELS_PER_TOKEN = 750
+
+
+def fast_resize(image, size):
+    """LANCZOS resize to size. Large shrink factors first go through
+    Image.reduce, a cheap integer box filter, so LANCZOS only has to
+    filter about twice the target size."""
+    factor = min(image.width // size[0], image.height // size[1]) // 2
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image.resize(size, Image.LANCZOS)
+
+
+def content_profile(image, sample_size=1024, edge_threshold=32, max_colors=256):
+    """Return (edge_density, flat) for image.
+    
+    edge_density is the fraction of pixels with a strong horizontal or
+    vertical gradient: text, rules and borders. flat is True when there
+    are at most max_colors colours, as in most application windows. Both
+    are measured on a nearest-neighbour sample of at most sample_size
+    pixels a side, which adds no colours and is cheap at any resolution.
+    """
+    import numpy as np
+    width, height = image.size
+    scale = max(width, height) / sample_size
+    if scale > 1:
+        image = image.resize((max(1, round(width / scale)), max(1, round(height / scale))), Image.NEAREST)
+    flat = image.mode == "P" or image.getcolors(max_colors) is not None
+    pixels = np.asarray(image.convert("L"), dtype=np.int16)
+    if pixels.shape[0] < 2 or pixels.shape[1] < 2:
+        return 0.0, flat
+    edges = np.abs(np.diff(pixels, axis=1))[:-1] > edge_threshold
+    edges |= np.abs(np.diff(pixels, axis=0))[:, :-1] > edge_threshold
+    return float(edges.mean()), flat
+
+
+def resize_for_upload(image, max_size=1024):
+    """Downscale image so its longest side is at most max_size (no encode)"""
+    width, height = image.size
+    
+    if width > max_size or height > max_size:
+        if width > height:
+            new_width = max_size
+            new_height = int(height * (max_size / width))
+        else:
+            new_height = max_size
+            new_width = int(width * (max_size / height))
+        
+        image = fast_resize(image, (new_width, new_height))
+    
+    return image
+
+
+def encode_image(image, image_format="png", quality=90, optimize="default"):
+    """Encode image straight to bytes in one pass, without re-decoding it.
+    
+    quality applies to the lossy formats (jpeg, webp); optimize trades
+    encode time for size and is one of OPTIMIZE_LEVELS.
+    """
+    pil_format = IMAGE_FORMATS[image_format][0]
+    level = OPTIMIZE_LEVELS.index(optimize)
+    params = {}
+    
+    if image_format == "png":
+        params["compress_level"] = (1, 6, 9)[level]
+        params["optimize"] = level == 2
+    elif image_format == "webp-lossless":
+        # For lossless WebP, quality is the compression effort
+        params.update(lossless=True, quality=(0, 75, 100)[level], method=(0, 4, 6)[level])
+    elif image_format == "webp":
+        params.update(quality=quality, method=(0, 4, 6)[level])
+    elif image_format == "jpeg":
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        params.update(quality=quality, optimize=level > 0)
+    
+    output = BytesIO()
+    image.save(output, format=pil_format, **params)
+    return output.getvalue()
+
+
+class CaptureEncoder:
+    """Single encode stage for a capture.
+    
+    Produces the archival file and the upload bytes straight from the
+    grabbed image: the upload copy is downscaled in memory and encoded
+    once, the archive is encoded once at full resolution, and nothing is
+    decoded again. When no downscale is needed and both outputs share a
+    format, one encode serves both.
+    
+    By default the upload copy's longest side is capped at max_size. In
+    adaptive mode its size follows the content instead (see adaptive_size)
+    and flat, few-colour images are palette-quantized before a lossless
+    upload encode.
+    """
+    BUDGET_RETRIES = 2
+
+    def __init__(self, upload_format="png", archive_format="png", quality=90,
+                 optimize="default", max_size=1024, adaptive=False, adaptive_min_size=640,
+                 adaptive_max_size=2048, byte_budget=None, token_budget=None):
+        if upload_format not in IMAGE_FORMATS or archive_format not in IMAGE_FORMATS:
+            raise ValueError(f"Image format must be one of {', '.join(IMAGE_FORMATS)}")
+        if optimize not in OPTIMIZE_LEVELS:
+            raise ValueError(f"Optimize level must be one of {', '.join(OPTIMIZE_LEVELS)}")
+        if not 0 < adaptive_min_size <= adaptive_max_size:
+            raise ValueError("Adaptive sizes must satisfy 0 < min size <= max size")
+        self.upload_format = upload_format
+        self.archive_format = archive_format
+        self.quality = quality
+        self.optimize = optimize
+        self.max_size = max_size
+        self.adaptive = adaptive
+        self.adaptive_min_size = adaptive_min_size
+        self.adaptive_max_size = adaptive_max_size
+        self.byte_budget = byte_budget  # Target upload bytes per image
+        self.token_budget = token_budget  # Target vision tokens per image
+        # Upload bytes per edge pixel, by whether the image was quantized;
+        # starts from typical UI screenshots and follows recent encodes
+        self.bytes_per_edge_pixel = {False: 3.0, True: 0.6}
+
+    @property
+    def upload_mime(self):
+        return IMAGE_FORMATS[self.upload_format][1]
+
+    @property
+    def archive_extension(self):
+        return IMAGE_FORMATS[self.archive_format][2]
+
+    @property
+    def size_limit(self):
+        """Longest side an upload image can have"""
+        return self.adaptive_max_size if self.adaptive else self.max_size
+
+    def prepare_upload(self, image):
+        """Downscale image for upload; returns (upload_image, profile), where
+        profile is image's content_profile in adaptive mode and else None"""
+        if not self.adaptive:
+            return resize_for_upload(image, self.max_size), None
+        profile = content_profile(image)
+        size = self.adaptive_size(image.size, profile)
+        if size != image.size:
+            image = fast_resize(image, size)
+        return image, profile
+
+    def adaptive_size(self, size, profile):
+        """Upload size for an image of the given size and content profile.
+        
+        The longest side goes from adaptive_min_size for sparse content to
+        adaptive_max_size for dense text, which needs the resolution to
+        stay legible. Content with many colours (photos, video) has edges
+        that are not text, so it stops at max_size. The pixel count is then
+        capped by the token budget, and by the byte budget at the bytes per
+        edge pixel of recent encodes. Images are never upscaled.
+        """
+        width, height = size
+        density, flat = profile
+        weight = min(1.0, density / DENSE_EDGE_DENSITY)
+        largest = self.adaptive_max_size if flat else max(self.adaptive_min_size, self.max_size)
+        long_side = self.adaptive_min_size + (largest - self.adaptive_min_size) * weight
+        pixels = width * height * min(1.0, long_side / max(width, height)) ** 2
+        if self.token_budget:
+            pixels = min(pixels, self.token_budget * PIXELS_PER_TOKEN)
+        if self.byte_budget:
+            bytes_per_pixel = self.bytes_per_edge_pixel[self.quantizes(profile)] * max(density, MIN_EDGE_DENSITY)
+            pixels = min(pixels, self.byte_budget / bytes_per_pixel)
+        scale = min(1.0, (pixels / (width * height)) ** 0.5)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def quantizes(self, profile):
+        """Whether an upload image with this profile is palette-quantized"""
+        return profile is not None and profile[1] and self.upload_format in PALETTE_FORMATS
+
+    def encode_upload_image(self, upload_image, profile=None):
+        """Encode a prepared upload image; returns (upload_bytes, timings, size).
+        
+        In adaptive mode with a byte budget, a result over budget is shrunk
+        by the square root of the overshoot and encoded again, up to
+        BUDGET_RETRIES times, so the budget holds unless the image would
+        need to go below adaptive_min_size / 4 to meet it.
+        """
+        timings = {}
+        quantized = self.quantizes(profile) and upload_image.mode == "RGB"
+        if quantized:
+            # Few colours to begin with: 256 are plenty even after resampling
+            start = time.perf_counter()
+            upload_image = upload_image.quantize(256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+            timings["quantize"] = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        upload_bytes = encode_image(upload_image, self.upload_format, self.quality, self.optimize)
+        timings["encode_upload"] = (time.perf_counter() - start) * 1000
+        
+        if profile is not None:
+            edge_pixels = upload_image.width * upload_image.height * max(profile[0], MIN_EDGE_DENSITY)
+            previous = self.bytes_per_edge_pixel[quantized]
+            self.bytes_per_edge_pixel[quantized] = 0.7 * previous + 0.3 * len(upload_bytes) / edge_pixels
+        
+            start = time.perf_counter()
+            for _ in range(self.BUDGET_RETRIES):
+                if not self.byte_budget or len(upload_bytes) <= self.byte_budget:
+                    break
+                # Bytes scale roughly with pixels; aim a little under the budget
+                scale = 0.95 * (self.byte_budget / len(upload_bytes)) ** 0.5
+                size = (round(upload_image.width * scale), round(upload_image.height * scale))
+                if max(size) < self.adaptive_min_size / 4:
+                    break
+                upload_image = fast_resize(upload_image.convert("RGB"), size)
+                if quantized:
+                    upload_image = upload_image.quantize(256, method=Image.Quantize.FASTOCTREE,
+                                                         dither=Image.Dither.NONE)
+                upload_bytes = encode_image(upload_image, self.upload_format, self.quality, self.optimize)
+                timings["shrink"] = (time.perf_counter() - start) * 1000
+        return upload_bytes, timings, upload_image.size
+
+    def encode_upload(self, image):
+        """Downscale and encode image for upload only (no archive)"""
+        return self.encode_upload_image(*self.prepare_upload(image))[0]
+
+    def encode(self, image, archive_base_path):
+        """Write the archive next to archive_base_path and return
+        (archive_path, upload_bytes, timings) with per-stage times in ms"""
+        start = time.perf_counter()
+        upload_image, profile = self.prepare_upload(image)
+        resize_ms = (time.perf_counter() - start) * 1000
+        
+        archive_path, upload_bytes, timings = self.encode_prepared(image, upload_image, archive_base_path,
+                                                                   profile)
+        return archive_path, upload_bytes, dict(resize=resize_ms, **timings)
+
+    def encode_prepared(self, image, upload_image, archive_base_path, profile=None):
+        """Like encode(), for an upload_image that has already been downscaled"""
+        upload_bytes, archive_bytes, timings, _ = self.encode_pair(image, upload_image, profile)
+        
+        start = time.perf_counter()
+        archive_path = archive_base_path + self.archive_extension
+        with open(archive_path, "wb") as f:
+            f.write(archive_bytes)
+        timings["archive"] += (time.perf_counter() - start) * 1000
+        
+        return archive_path, upload_bytes, timings
+
+    def encode_pair(self, image, upload_image, profile=None):
+        """Return (upload_bytes, archive_bytes, timings, upload_size) without writing anything"""
+        upload_bytes, timings, upload_size = self.encode_upload_image(upload_image, profile)
+        
+        start = time.perf_counter()
+        reencoded = "quantize" in timings or "shrink" in timings
+        if upload_image is image and self.archive_format == self.upload_format and not reencoded:
+            archive_bytes = upload_bytes
+        else:
+            archive_bytes = encode_image(image, self.archive_format, self.quality, self.optimize)
+        timings["archive"] = (time.perf_counter() - start) * 1000
+        
+        return upload_bytes, archive_bytes, timings, upload_size
+
+
+class CaptureJob:
+    """State carried by one capture as it moves through the pipeline stages"""
+    def __init__(self, interval=False):
+        self.interval = interval  # Triggered by IntervalCapture rather than a click
+        self.window_title = None
+        self.capture_type = None
+        self.screenshot = None
+        self.upload_image = None
+        self.profile = None  # content_profile of the screenshot, in adaptive mode
+        self.upload_size = None
+        self.image_bytes = 0  # Encoded upload image, before base64
+        self.encode_ms = None  # Upload image quantize + encode time
+        self.file_path = None
+        self.encoded = None
+        self.mime_type = None
+        self.upload_bytes = 0
+        self.result = None
+        self.window_bounds = None
+        self.phash = None
+        self.signature = None  # dedup_signature of the upload image, when deduplicating
+        self.duplicate = False
+        self.cache_hit = False
+        self.delta = None
+        self.streamed = False  # Card shown early, answer appended as it arrives
+        self.interrupted = False  # The streamed answer broke off; result is partial
+        self.error = None  # RequestException from the backend, when the upload failed
+        self.record = None  # That card's CaptureRecord, set on the Tk thread
+        self.stream_pieces = []  # Streamed text not yet appended to the card
+        self.traced = True  # Sampled for span timings (see Tracer)
+        self.submitted_at = None
+
+
+class PipelineStage:
+    """A pool of worker threads fed by a bounded queue.
+    
+    Each worker runs handler(job) and passes the returned job to the next
+    stage; returning None ends the job. Putting into a full downstream
+    queue blocks the worker, so a slow stage applies backpressure all the
+    way back to the capture button. Workers check the pipeline's stopping
+    flag between jobs and while waiting, so stop() never waits on them.
+    """
+    POLL_SECONDS = 0.25
+
+    def __init__(self, name, handler, workers=1, maxsize=4):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue = queue.Queue(maxsize)
+        self.pipeline = None
+        self.next_stage = None
+        self.processed = 0
+        self.errors = 0
+        self.active = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        self.started_at = time.monotonic()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        stopping = self.pipeline.stopping
+        while not stopping.is_set():
+            try:
+                job = self.queue.get(timeout=self.POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if job is None:
+                break
+            with self._lock:
+                self.active += 1
+            start = time.perf_counter()
+            try:
+                result = self.handler(job)
+            except Exception as e:
+                result = None
+                with self._lock:
+                    self.errors += 1
+                self.pipeline.on_error(self, job, e)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.processed += 1
+                    self.busy_seconds += time.perf_counter() - start
+            
+            if result is not None and self.next_stage is not None:
+                self._forward(result)
+            else:
+                self.pipeline.job_done()
+
+    def _forward(self, job):
+        """Put job on the next stage, waiting for room unless the pipeline stops"""
+        while not self.pipeline.stopping.is_set():
+            try:
+                self.next_stage.queue.put(job, timeout=self.POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def join(self, deadline):
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.started_at if self.started_at else 0
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "processed": self.processed,
+                "errors": self.errors,
+                "active": self.active,
+                "queue_depth": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "throughput": self.processed / elapsed if elapsed else 0.0,
+                "busy_seconds": self.busy_seconds,
+            }
+
+
+class CapturePipeline:
+    """Chain of PipelineStages; submit() never blocks the caller"""
+    def __init__(self, stages, on_error=None, on_idle=None):
+        self.stages = stages
+        self.on_error = on_error or (lambda stage, job, error: None)
+        self.on_idle = on_idle or (lambda: None)
+        self.in_flight = 0
+        self.stopping = threading.Event()
+        self._lock = threading.Lock()
+        for stage, next_stage in zip(stages, stages[1:] + [None]):
+            stage.pipeline = self
+            stage.next_stage = next_stage
+        for stage in stages:
+            stage.start()
+
+    def submit(self, job):
+        """Queue job at the first stage; returns False if it is full"""
+        with self._lock:
+            self.in_flight += 1
+        try:
+            self.stages[0].queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.in_flight -= 1
+            return False
+        return True
+
+    def job_done(self):
+        with self._lock:
+            self.in_flight -= 1
+            idle = self.in_flight == 0
+        if idle:
+            self.on_idle()
+
+    def stats(self):
+        return [stage.stats() for stage in self.stages]
+
+    def stop(self, timeout=2.0):
+        """Stop all workers without blocking on full queues or busy handlers.
+        
+        Queued jobs are dropped. Workers still inside a handler (e.g. a slow
+        upload) are daemon threads and are left behind after timeout seconds.
+        """
+        self.stopping.set()
+        for stage in self.stages:
+            try:
+                while True:
+                    stage.queue.get_nowait()
+            except queue.Empty:
+                pass
+            for _ in range(stage.workers):
+                try:
+                    stage.queue.put_nowait(None)  # Wake idle workers right away
+                except queue.Full:
+                    break
+        deadline = time.monotonic() + timeout
+        for stage in self.stages:
+            stage.join(deadline)
+
+
+class Tracer:
+    """Span timings, counters and latency histograms for the capture path.
+    
+    Each capture is sampled once, when it is submitted (job.traced), so
+    its spans are recorded all together or not at all; sample_rate=0
+    turns tracing off. Counters (captures, bytes uploaded, errors) are
+    always kept. Thread-safe: spans are recorded from every stage.
+    """
+    BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self, sample_rate=1.0, recent=100):
+        self.sample_rate = sample_rate
+        self.histograms = {}  # span name -> [bucket counts (last is +Inf), sum ms, count]
+        self.recent = {}  # span name -> deque of the latest durations in ms
+        self.recent_size = recent
+        self.counters = OrderedDict()  # (metric, label) -> value
+        self._lock = threading.Lock()
+
+    def sampled(self):
+        """Decide whether a new capture is traced"""
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    @contextmanager
+    def span(self, name, job=None):
+        """Time the block as span name (if job is None or traced)"""
+        if job is not None and not job.traced:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name, ms, job=None):
+        if job is not None and not job.traced:
+            return
+        bucket = bisect.bisect_left(self.BUCKETS_MS, ms)
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = [[0] * (len(self.BUCKETS_MS) + 1), 0.0, 0]
+                self.recent[name] = deque(maxlen=self.recent_size)
+            histogram[0][bucket] += 1
+            histogram[1] += ms
+            histogram[2] += 1
+            self.recent[name].append(ms)
+
+    def count(self, metric, value=1, label=None):
+        with self._lock:
+            key = (metric, label)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def recent_stats(self):
+        """{span: (count, last ms, p50 ms, p95 ms)} over the latest durations"""
+        with self._lock:
+            recent = {name: list(values) for name, values in self.recent.items()}
+            totals = {name: histogram[2] for name, histogram in self.histograms.items()}
+        stats = {}
+        for name, values in sorted(recent.items()):
+            ordered = sorted(values)
+            stats[name] = (totals[name], values[-1], ordered[len(ordered) // 2],
+                           ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))])
+        return stats
+
+    def prometheus_text(self, gauges=None):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = {name: (list(h[0]), h[1], h[2]) for name, h in self.histograms.items()}
+            counters = list(self.counters.items())
+        lines = [
+            "# HELP capture_span_seconds Duration of each traced capture stage",
+            "# TYPE capture_span_seconds histogram",
+        ]
+        for name, (buckets, total_ms, count) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.BUCKETS_MS + (None,), buckets):
+                cumulative += bucket_count
+                le = "+Inf" if bound is None else repr(bound / 1000)
+                lines.append(f'capture_span_seconds_bucket{{span="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'capture_span_seconds_sum{{span="{name}"}} {total_ms / 1000:.6f}')
+            lines.append(f'capture_span_seconds_count{{span="{name}"}} {count}')
+        for metric in dict.fromkeys(metric for (metric, _), _ in counters):
+            lines.append(f"# TYPE capture_{metric} counter")
+            for (name, label), value in counters:
+                if name == metric:
+                    labels = f'{{stage="{label}"}}' if label is not None else ""
+                    lines.append(f"capture_{metric}{labels} {value}")
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE capture_{name} gauge")
+            if isinstance(value, dict):  # Per-stage values
+                lines.extend(f'capture_{name}{{stage="{label}"}} {v}' for label, v in value.items())
+            else:
+                lines.append(f"capture_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def json_snapshot(self, gauges=None):
+        """All metrics as one JSON-serializable dict"""
+        with self._lock:
+            spans = {
+                name: {"count": h[2], "sum_ms": round(h[1], 3),
+                       "buckets_ms": dict(zip([str(b) for b in self.BUCKETS_MS] + ["+Inf"], h[0]))}
+                for name, h in self.histograms.items()
+            }
+            counters = {
+                metric if label is None else f"{metric}{{stage={label}}}": value
+                for (metric, label), value in self.counters.items()
+            }
+        return {"time": time.time(), "spans": spans, "counters": counters, "gauges": gauges or {}}
+
+
+class MetricsExporter:
+    """Exports a Tracer's metrics to a file and/or a local HTTP endpoint.
+    
+    A path ending in .prom is rewritten every interval seconds in the
+    Prometheus text format (suitable for node_exporter's textfile
+    collector); any other path gets one JSON line appended per interval.
+    With a port, GET /metrics on 127.0.0.1 returns the Prometheus text.
+    gauges() supplies current values such as queue depths, as
+    {name: value} or {name: {stage: value}}.
+    """
+    def __init__(self, tracer, gauges, path=None, port=None, interval=10):
+        self.tracer = tracer
+        self.gauges = gauges
+        self.path = path
+        self.interval = interval
+        self.server = None
+        self._stop = threading.Event()
+        if path:
+            threading.Thread(target=self._write_loop, name="metrics-export", daemon=True).start()
+        if port is not None:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+            exporter = self
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = exporter.tracer.prometheus_text(exporter.gauges()).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            if self.path.endswith(".prom"):
+                temp_path = self.path + ".tmp"
+                with open(temp_path, "w") as f:
+                    f.write(self.tracer.prometheus_text(self.gauges()))
+                os.replace(temp_path, self.path)
+            else:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(self.tracer.json_snapshot(self.gauges())) + "\n")
+        except OSError as e:
+            print("Error exporting metrics:", str(e))
+
+    def close(self):
+        self._stop.set()
+        if self.path:
+            self.write()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+DEFAULT_API_URL = "http://localhost:8001/v1/chat"
+CAPTURE_PROMPT = "get only the Inspector's Notes and Engine description from this image"
+# Answer formats post_stream can read, preferred first
+STREAM_ACCEPT = "text/event-stream, text/plain, application/json"
+# Responses worth retrying: rate limiting and transient gateway errors
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """Full-jitter exponential backoff for the given retry attempt (0-based)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class StreamingPayload:
+    """The /v1/chat request body, serialized in chunks straight from the encoded image.
+    
+    The image appears twice in the request (user_message.image and the
+    conversation_history attachment). Both copies are base64-encoded
+    incrementally from the same encoded bytes while the body is read, so
+    neither the base64 string nor the full JSON document is ever built in
+    memory. It is a readable, rewindable file-like object with a known
+    length, so requests sends it with a Content-Length, and the same
+    object can be streamed to disk afterwards. extra holds additional
+    top-level fields (e.g. "delta") serialized ahead of the image.
+    """
+    def __init__(self, encoded, mime_type, session_id, prompt=CAPTURE_PROMPT, chunk_size=48 * 1024,
+                 extra=None):
+        self.encoded = memoryview(encoded)
+        # Keep chunks a multiple of 3 bytes so base64 pieces concatenate cleanly
+        self.chunk_size = chunk_size - chunk_size % 3
+        uri_prefix = f"data:{mime_type};base64,"
+        extra_fields = "".join(
+            f"{json.dumps(name)}: {json.dumps(value)}, " for name, value in (extra or {}).items()
+        )
+        self._parts = [
+            f'{{"session_id": {json.dumps(session_id)}, {extra_fields}"user_message": {{"type": "image", '
+            f'"image": ["{uri_prefix}'.encode(),
+            None,  # image
+            f'"]}}, "conversation_history": [{{"role": "user", "content": {json.dumps(prompt)}, '
+            f'"attachments": [{{"type": "file", "base64String": ["{uri_prefix}'.encode(),
+            None,  # image
+            b'"]}]}]}',
+        ]
+        self.base64_length = 4 * ((len(self.encoded) + 2) // 3)
+        self.length = sum(len(part) if part is not None else self.base64_length for part in self._parts)
+        self.seek(0)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for part in self._parts:
+            if part is not None:
+                yield part
+                continue
+            for start in range(0, len(self.encoded), self.chunk_size):
+                yield base64.b64encode(self.encoded[start:start + self.chunk_size])
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length - self._position
+        pieces = []
+        while size > 0:
+            if self._pending_offset >= len(self._pending):
+                self._pending = next(self._chunks, b"")
+                self._pending_offset = 0
+                if not self._pending:
+                    break
+            piece = self._pending[self._pending_offset:self._pending_offset + size]
+            self._pending_offset += len(piece)
+            size -= len(piece)
+            pieces.append(piece)
+        data = b"".join(pieces)
+        self._position += len(data)
+        return data
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        """Rewind to the start; the body is regenerated, so only seek(0) is supported"""
+        if offset != 0 or whence != 0:
+            raise OSError("StreamingPayload can only be rewound to the start")
+        self._chunks = iter(self)
+        self._pending = b""
+        self._pending_offset = 0
+        self._position = 0
+        return 0
+
+    def write_to(self, f):
+        """Stream the whole body into a binary file object"""
+        for chunk in self:
+            f.write(chunk)
+
+
+class ApiTransport:
+    """Pooled keep-alive HTTP transport for the backend chat endpoint.
+    
+    One requests.Session is shared by all upload workers so connections
+    are reused. Every request has connect/read timeouts, connection errors,
+    timeouts and RETRY_STATUSES are retried with jittered backoff, and at
+    most max_in_flight requests are outstanding at once.
+    """
+    def __init__(self, url=DEFAULT_API_URL, connect_timeout=3.05, read_timeout=120,
+                 retries=3, backoff=0.5, max_in_flight=4):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_in_flight = max_in_flight
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    @property
+    def session(self):
+        """The shared requests.Session; requests is imported on first upload"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    session.headers.update({"Content-Type": "application/json"})
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def post_json(self, payload=None, data=None):
+        """POST payload (or pre-serialized data) and return the decoded JSON response"""
+        import requests
+        with self._slots:
+            for attempt in range(self.retries + 1):
+                last_attempt = attempt == self.retries
+                if hasattr(data, "seek"):
+                    data.seek(0)
+                try:
+                    response = self.session.post(self.url, json=payload, data=data, timeout=self.timeout)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if last_attempt:
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUSES or last_attempt:
+                        response.raise_for_status()
+                        return response.json()
+                    response.close()
+                time.sleep(backoff_delay(attempt, self.backoff))
+
+    def post_stream(self, data, on_text):
+        """POST data asking for a streamed answer and return the full text.
+        
+        on_text(text) is called with each piece of the assistant message as
+        it arrives. The backend may stream Server-Sent Events (one JSON
+        object with a "delta" per data line, ending with [DONE]; other data
+        lines are taken as literal text) or chunked plain text; a backend
+        that answers with a regular JSON body is handled too, with its
+        assistant_message delivered as one piece.
+        Only failures before the response starts are retried.
+        """
+        import requests
+        with self._slots:
+            for attempt in range(self.retries + 1):
+                last_attempt = attempt == self.retries
+                data.seek(0)
+                try:
+                    response = self.session.post(self.url, data=data, timeout=self.timeout, stream=True,
+                                                 headers={"Accept": STREAM_ACCEPT})
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if last_attempt:
+                        raise
+                else:
+                    with response:
+                        if response.status_code not in RETRY_STATUSES or last_attempt:
+                            response.raise_for_status()
+                            return self.read_stream(response, on_text)
+                time.sleep(backoff_delay(attempt, self.backoff))
+
+    @staticmethod
+    def read_stream(response, on_text):
+        content_type = response.headers.get("Content-Type", "")
+        if content_type.startswith("application/json"):
+            message = response.json().get("assistant_message")
+            if message:
+                on_text(message)
+            return message
+        
+        if "charset" not in content_type:
+            response.encoding = "utf-8"
+        pieces = []
+        if content_type.startswith("text/event-stream"):
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line.startswith("data:"):
+                    continue  # Blank separators, comments, event/id fields
+                field = line[5:].lstrip()
+                if field == "[DONE]":
+                    break
+                try:
+                    event = json.loads(field)
+                except ValueError:
+                    event = None
+                # Anything but a {"delta": ...} object is the text itself
+                text = event.get("delta") if isinstance(event, dict) else field
+                if text:
+                    pieces.append(text)
+                    on_text(text)
+        else:
+            for text in response.iter_content(chunk_size=None, decode_unicode=True):
+                if text:
+                    pieces.append(text)
+                    on_text(text)
+        return "".join(pieces)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+class AsyncApiTransport:
+    """asyncio variant of ApiTransport built on aiohttp (optional dependency)"""
+    def __init__(self, url=DEFAULT_API_URL, connect_timeout=3.05, read_timeout=120,
+                 retries=3, backoff=0.5, max_in_flight=4):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("AsyncApiTransport requires aiohttp (pip install aiohttp)")
+        self._aiohttp = aiohttp
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_in_flight = max_in_flight
+        self.session = None
+        self._slots = None
+
+    async def __aenter__(self):
+        import asyncio
+        connector = self._aiohttp.TCPConnector(limit=self.max_in_flight)
+        self.session = self._aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def post_json(self, payload=None, data=None):
+        import asyncio
+        aiohttp = self._aiohttp
+        async with self._slots:
+            for attempt in range(self.retries + 1):
+                last_attempt = attempt == self.retries
+                try:
+                    async with self.session.post(self.url, json=payload, data=data,
+                                                 headers={"Content-Type": "application/json"}) as response:
+                        if response.status not in RETRY_STATUSES or last_attempt:
+                            response.raise_for_status()
+                            return await response.json()
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if last_attempt:
+                        raise
+                await asyncio.sleep(backoff_delay(attempt, self.backoff))
+
+
+class XlibClient:
+    """Base for in-process Xlib clients that own a display connection.
+    
+    Loads libX11 through ctypes and opens the display, raising OSError if
+    either is unavailable. Subclasses wrap each batch of requests in
+    trap_errors() so X errors (a window closing, a region off screen) are
+    reported back instead of Xlib's default handler exiting the process.
+    """
+    def __init__(self, display_name=None):
+        import ctypes.util
+        
+        library = ctypes.util.find_library("X11")
+        if not library:
+            raise OSError("libX11 not found")
+        xlib = ctypes.cdll.LoadLibrary(library)
+        
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XFree.argtypes = [ctypes.c_void_p]
+        xlib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XSetErrorHandler.restype = ctypes.c_void_p
+        xlib.XSetErrorHandler.argtypes = [ctypes.c_void_p]
+        self.xlib = xlib
+        
+        self.display = xlib.XOpenDisplay(display_name.encode() if display_name else None)
+        if not self.display:
+            raise OSError("Cannot open X display")
+        self.root_window = xlib.XDefaultRootWindow(self.display)
+        self.x_error = None
+        # Keep a reference so the callback isn't garbage collected
+        error_handler_type = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+        self._error_handler = error_handler_type(self._on_x_error)
+        self._lock = threading.Lock()
+
+    def _on_x_error(self, display, event):
+        self.x_error = True
+        return 0
+
+    @contextmanager
+    def trap_errors(self):
+        """Serialize access to the connection and trap X errors raised inside
+        the block; check self.x_error afterwards"""
+        with self._lock:
+            if not self.display:
+                raise OSError("X display connection is closed")
+            self.x_error = None
+            previous_handler = self.xlib.XSetErrorHandler(
+                ctypes.cast(self._error_handler, ctypes.c_void_p)
+            )
+            try:
+                yield
+                self.xlib.XSync(self.display, False)
+            finally:
+                self.xlib.XSetErrorHandler(previous_handler)
+
+    def close(self):
+        with self._lock:
+            if self.display:
+                self.xlib.XCloseDisplay(self.display)
+                self.display = None
+
+
+class X11WindowQuery(XlibClient):
+    """In-process active-window query over a persistent Xlib connection.
+    
+    Reads _NET_ACTIVE_WINDOW, _NET_WM_NAME (falling back to WM_NAME) and
+    the window geometry, widened by _NET_FRAME_EXTENTS so decorations are
+    included, without spawning xdotool. Also reports the pointer position
+    and the monitor layout (RandR 1.5, when libXrandr is installed).
+    """
+
+    class XRRMonitorInfo(ctypes.Structure):
+        _fields_ = [
+            ("name", ctypes.c_ulong), ("primary", ctypes.c_int), ("automatic", ctypes.c_int),
+            ("noutput", ctypes.c_int),
+            ("x", ctypes.c_int), ("y", ctypes.c_int), ("width", ctypes.c_int), ("height", ctypes.c_int),
+            ("mwidth", ctypes.c_int), ("mheight", ctypes.c_int),
+            ("outputs", ctypes.c_void_p),
+        ]
+
+    def __init__(self, display_name=None):
+        super().__init__(display_name)
+        import ctypes.util
+        
+        xlib = self.xlib
+        c_ulong_p = ctypes.POINTER(ctypes.c_ulong)
+        c_int_p = ctypes.POINTER(ctypes.c_int)
+        c_uint_p = ctypes.POINTER(ctypes.c_uint)
+        
+        xlib.XInternAtom.restype = ctypes.c_ulong
+        xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        xlib.XGetWindowProperty.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_long, ctypes.c_long,
+            ctypes.c_int, ctypes.c_ulong, c_ulong_p, c_int_p, c_ulong_p, c_ulong_p,
+            ctypes.POINTER(ctypes.c_void_p)
+        ]
+        xlib.XGetGeometry.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, c_ulong_p, c_int_p, c_int_p,
+            c_uint_p, c_uint_p, c_uint_p, c_uint_p
+        ]
+        xlib.XTranslateCoordinates.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+            c_int_p, c_int_p, c_ulong_p
+        ]
+        xlib.XQueryPointer.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, c_ulong_p, c_ulong_p, c_int_p, c_int_p, c_int_p, c_int_p, c_uint_p
+        ]
+        xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        xlib.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.atoms = {
+            name: xlib.XInternAtom(self.display, name.encode(), False)
+            for name in ("_NET_ACTIVE_WINDOW", "_NET_WM_NAME", "WM_NAME", "UTF8_STRING", "_NET_FRAME_EXTENTS")
+        }
+        screen = xlib.XDefaultScreen(self.display)
+        self.screen_size = (xlib.XDisplayWidth(self.display, screen), xlib.XDisplayHeight(self.display, screen))
+        
+        self.xrandr = None  # Without it the whole screen counts as one monitor
+        library = ctypes.util.find_library("Xrandr")
+        if library:
+            xrandr = ctypes.cdll.LoadLibrary(library)
+            if hasattr(xrandr, "XRRGetMonitors"):
+                xrandr.XRRGetMonitors.restype = ctypes.POINTER(self.XRRMonitorInfo)
+                xrandr.XRRGetMonitors.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, c_int_p]
+                xrandr.XRRFreeMonitors.argtypes = [ctypes.POINTER(self.XRRMonitorInfo)]
+                self.xrandr = xrandr
+
+    def _get_property(self, window, name, max_length=1024):
+        """Return (format, data) for a window property, or (0, None) if unset"""
+        actual_type = ctypes.c_ulong()
+        actual_format = ctypes.c_int()
+        nitems = ctypes.c_ulong()
+        bytes_after = ctypes.c_ulong()
+        prop = ctypes.c_void_p()
+        status = self.xlib.XGetWindowProperty(
+            self.display, window, self.atoms[name], 0, max_length, False, 0,  # AnyPropertyType
+            ctypes.byref(actual_type), ctypes.byref(actual_format), ctypes.byref(nitems),
+            ctypes.byref(bytes_after), ctypes.byref(prop)
+        )
+        if status != 0 or not prop.value:
+            return 0, None
+        try:
+            if actual_format.value == 8:
+                return 8, ctypes.string_at(prop.value, nitems.value)
+            if actual_format.value == 32:
+                # Format-32 items are returned as C longs
+                return 32, list((ctypes.c_ulong * nitems.value).from_address(prop.value))
+            return actual_format.value, None
+        finally:
+            self.xlib.XFree(prop)
+
+    def active_window_info(self):
+        """Return (title, (x, y, width, height)) for the active window, or None"""
+        with self.trap_errors():
+            _, active = self._get_property(self.root_window, "_NET_ACTIVE_WINDOW")
+            if not active or not active[0]:
+                return None
+            window = active[0]
+            
+            _, title = self._get_property(window, "_NET_WM_NAME")
+            if title is None:
+                _, title = self._get_property(window, "WM_NAME")
+            title = title.decode("utf-8", "replace") if title else ""
+            
+            root = ctypes.c_ulong()
+            x, y = ctypes.c_int(), ctypes.c_int()
+            width, height = ctypes.c_uint(), ctypes.c_uint()
+            border, depth = ctypes.c_uint(), ctypes.c_uint()
+            if not self.xlib.XGetGeometry(
+                self.display, window, ctypes.byref(root), ctypes.byref(x), ctypes.byref(y),
+                ctypes.byref(width), ctypes.byref(height), ctypes.byref(border), ctypes.byref(depth)
+            ):
+                return None
+            
+            # Window-relative origin to root coordinates
+            child = ctypes.c_ulong()
+            self.xlib.XTranslateCoordinates(
+                self.display, window, self.root_window, 0, 0,
+                ctypes.byref(x), ctypes.byref(y), ctypes.byref(child)
+            )
+            left = right = top = bottom = 0
+            _, extents = self._get_property(window, "_NET_FRAME_EXTENTS")
+            if extents and len(extents) == 4:
+                left, right, top, bottom = extents
+        
+        if self.x_error:
+            return None
+        return title, (
+            x.value - left,
+            y.value - top,
+            width.value + left + right,
+            height.value + top + bottom
+        )
+
+    def pointer_position(self):
+        """Root coordinates (x, y) of the mouse pointer, or None if it is on another screen"""
+        root, child = ctypes.c_ulong(), ctypes.c_ulong()
+        root_x, root_y = ctypes.c_int(), ctypes.c_int()
+        window_x, window_y = ctypes.c_int(), ctypes.c_int()
+        mask = ctypes.c_uint()
+        with self.trap_errors():
+            same_screen = self.xlib.XQueryPointer(
+                self.display, self.root_window, ctypes.byref(root), ctypes.byref(child),
+                ctypes.byref(root_x), ctypes.byref(root_y), ctypes.byref(window_x), ctypes.byref(window_y),
+                ctypes.byref(mask)
+            )
+        if self.x_error or not same_screen:
+            return None
+        return root_x.value, root_y.value
+
+    def monitors(self):
+        """(x, y, width, height) of each active monitor, in root coordinates"""
+        whole_screen = [(0, 0) + self.screen_size]
+        if self.xrandr is None:
+            return whole_screen
+        count = ctypes.c_int()
+        with self.trap_errors():
+            info = self.xrandr.XRRGetMonitors(self.display, self.root_window, True, ctypes.byref(count))
+        if self.x_error or not info:
+            return whole_screen
+        try:
+            return [(m.x, m.y, m.width, m.height) for m in info[:count.value]] or whole_screen
+        finally:
+            self.xrandr.XRRFreeMonitors(info)
+
+
+class PyAutoGuiGrabber:
+    """Screen grab through pyautogui/pyscreeze; works everywhere, the default fallback"""
+    name = "pyautogui"
+
+    def grab(self, region=None):
+        """Return an RGB Image of region (x, y, width, height), or of the whole screen"""
+        # Imported on first use: pyautogui needs a display, headless batch runs don't
+        import pyautogui
+        
+        if region is None:
+            return pyautogui.screenshot()
+        return pyautogui.screenshot(region=region)
+
+    def close(self):
+        pass
+
+
+class XImageGrabber(XlibClient):
+    """Shared XImage plumbing for the Xlib grab backends"""
+
+    class XImage(ctypes.Structure):
+        _fields_ = [
+            ("width", ctypes.c_int), ("height", ctypes.c_int),
+            ("xoffset", ctypes.c_int), ("format", ctypes.c_int),
+            ("data", ctypes.c_void_p),
+            ("byte_order", ctypes.c_int), ("bitmap_unit", ctypes.c_int),
+            ("bitmap_bit_order", ctypes.c_int), ("bitmap_pad", ctypes.c_int),
+            ("depth", ctypes.c_int), ("bytes_per_line", ctypes.c_int),
+            ("bits_per_pixel", ctypes.c_int),
+            ("red_mask", ctypes.c_ulong), ("green_mask", ctypes.c_ulong), ("blue_mask", ctypes.c_ulong),
+            ("obdata", ctypes.c_void_p),
+            ("funcs", ctypes.c_void_p * 6),
+        ]
+
+    ZPixmap = 2
+    AllPlanes = 0xFFFFFFFF
+
+    def __init__(self, display_name=None):
+        super().__init__(display_name)
+        xlib = self.xlib
+        xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        xlib.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XDestroyImage.argtypes = [ctypes.c_void_p]
+        screen = xlib.XDefaultScreen(self.display)
+        self.screen = screen
+        self.screen_size = (xlib.XDisplayWidth(self.display, screen), xlib.XDisplayHeight(self.display, screen))
+
+    def clip_region(self, region):
+        """Intersect region with the screen; X rejects grabs that fall outside it"""
+        screen_width, screen_height = self.screen_size
+        if region is None:
+            return 0, 0, screen_width, screen_height
+        x, y, width, height = region
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + width, screen_width), min(y + height, screen_height)
+        if right <= left or bottom <= top:
+            raise ValueError("Capture region is outside the screen")
+        return left, top, right - left, bottom - top
+
+    def to_pil(self, ximage):
+        """Convert a 32bpp little-endian ZPixmap XImage into a PIL RGB Image.
+        
+        Image.frombuffer reads the pixels straight from the X buffer; the
+        BGRX -> RGB unpack is the only pass over them.
+        """
+        if ximage.bits_per_pixel != 32 or ximage.byte_order != 0:  # LSBFirst
+            raise OSError(f"Unsupported XImage layout ({ximage.bits_per_pixel} bpp)")
+        size = ximage.bytes_per_line * ximage.height
+        buffer = (ctypes.c_char * size).from_address(ximage.data)
+        return Image.frombuffer(
+            "RGB", (ximage.width, ximage.height), buffer, "raw", "BGRX", ximage.bytes_per_line, 1
+        )
+
+
+class XGetImageGrabber(XImageGrabber):
+    """Grab only the requested region with a plain XGetImage round-trip"""
+    name = "xgetimage"
+
+    def __init__(self, display_name=None):
+        super().__init__(display_name)
+        self.xlib.XGetImage.restype = ctypes.POINTER(self.XImage)
+        self.xlib.XGetImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+            ctypes.c_uint, ctypes.c_uint, ctypes.c_ulong, ctypes.c_int
+        ]
+
+    def grab(self, region=None):
+        x, y, width, height = self.clip_region(region)
+        with self.trap_errors():
+            ximage = self.xlib.XGetImage(
+                self.display, self.root_window, x, y, width, height, self.AllPlanes, self.ZPixmap
+            )
+        if self.x_error or not ximage:
+            raise OSError("XGetImage failed")
+        try:
+            return self.to_pil(ximage.contents)
+        finally:
+            self.xlib.XDestroyImage(ximage)
+
+
+class XShmGrabber(XImageGrabber):
+    """Grab the requested region through the MIT-SHM extension.
+    
+    The X server writes the pixels straight into a shared-memory segment
+    that is reused across grabs (and only reallocated when the region size
+    changes), so there is no socket transfer of the image.
+    """
+    name = "xshm"
+
+    class XShmSegmentInfo(ctypes.Structure):
+        _fields_ = [
+            ("shmseg", ctypes.c_ulong), ("shmid", ctypes.c_int),
+            ("shmaddr", ctypes.c_void_p), ("readOnly", ctypes.c_int),
+        ]
+
+    IPC_PRIVATE = 0
+    IPC_CREAT = 0o1000
+    IPC_RMID = 0
+
+    def __init__(self, display_name=None):
+        super().__init__(display_name)
+        import ctypes.util
+        
+        self.ximage = None
+        self.shminfo = None
+        library = ctypes.util.find_library("Xext")
+        if not library:
+            raise OSError("libXext not found")
+        xext = ctypes.cdll.LoadLibrary(library)
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.restype = ctypes.POINTER(self.XImage)
+        xext.XShmCreateImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p,
+            ctypes.POINTER(self.XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint
+        ]
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(self.XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(self.XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(self.XImage),
+            ctypes.c_int, ctypes.c_int, ctypes.c_ulong
+        ]
+        self.xext = xext
+        if not xext.XShmQueryExtension(self.display):
+            self.close()
+            raise OSError("X server has no MIT-SHM extension")
+        
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+        self.libc = libc
+        
+        self.xlib.XDefaultVisual.restype = ctypes.c_void_p
+        self.xlib.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.xlib.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.visual = self.xlib.XDefaultVisual(self.display, self.screen)
+        self.depth = self.xlib.XDefaultDepth(self.display, self.screen)
+
+    def _allocate(self, width, height):
+        """(Re)create the shared XImage for a width x height region"""
+        self._release()
+        shminfo = self.XShmSegmentInfo()
+        ximage = self.xext.XShmCreateImage(
+            self.display, self.visual, self.depth, self.ZPixmap, None, ctypes.byref(shminfo), width, height
+        )
+        if not ximage:
+            raise OSError("XShmCreateImage failed")
+        size = ximage.contents.bytes_per_line * height
+        shminfo.shmid = self.libc.shmget(self.IPC_PRIVATE, size, self.IPC_CREAT | 0o600)
+        if shminfo.shmid < 0:
+            self.xlib.XDestroyImage(ximage)
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        address = self.libc.shmat(shminfo.shmid, None, 0)
+        # Mark for removal now; the segment lives until both sides detach
+        self.libc.shmctl(shminfo.shmid, self.IPC_RMID, None)
+        if address in (None, ctypes.c_void_p(-1).value):
+            self.xlib.XDestroyImage(ximage)
+            raise OSError(ctypes.get_errno(), "shmat failed")
+        shminfo.shmaddr = address
+        shminfo.readOnly = False
+        ximage.contents.data = address
+        with self.trap_errors():
+            self.xext.XShmAttach(self.display, ctypes.byref(shminfo))
+        self.ximage, self.shminfo = ximage, shminfo
+        if self.x_error:
+            self._release()
+            raise OSError("XShmAttach failed")
+
+    def _release(self):
+        if self.ximage is None:
+            return
+        with self.trap_errors():
+            self.xext.XShmDetach(self.display, ctypes.byref(self.shminfo))
+        # The data belongs to the shm segment, not to Xlib's allocator
+        self.ximage.contents.data = None
+        self.xlib.XDestroyImage(self.ximage)
+        self.libc.shmdt(self.shminfo.shmaddr)
+        self.ximage = self.shminfo = None
+
+    def grab(self, region=None):
+        x, y, width, height = self.clip_region(region)
+        if self.ximage is None or (self.ximage.contents.width, self.ximage.contents.height) != (width, height):
+            self._allocate(width, height)
+        with self.trap_errors():
+            ok = self.xext.XShmGetImage(self.display, self.root_window, self.ximage, x, y, self.AllPlanes)
+        if self.x_error or not ok:
+            raise OSError("XShmGetImage failed")
+        # The segment is reused by the next grab, so the image owns its pixels
+        return self.to_pil(self.ximage.contents)
+
+    def close(self):
+        if self.display:
+            self._release()
+        super().close()
+
+
+# Screen grab backends by name, fastest first; "auto" tries them in order
+GRAB_BACKENDS = OrderedDict([
+    ("xshm", XShmGrabber),
+    ("xgetimage", XGetImageGrabber),
+    ("pyautogui", PyAutoGuiGrabber),
+])
+# Backends that read the X root window; "auto" only tries them on Linux,
+# since on macOS (XQuartz) that is not what is on screen
+X11_GRAB_BACKENDS = ("xshm", "xgetimage")
+
+
+def register_grab_backend(name, factory):
+    """Make a grab backend available by name; factory() returns an object
+    with grab(region=None) -> Image and close(), raising OSError if unusable"""
+    GRAB_BACKENDS[name] = factory
+
+
+def create_grabber(name="auto"):
+    """Instantiate the named grab backend, or the first usable one for "auto"."""
+    if name != "auto":
+        return GRAB_BACKENDS[name]()
+    for backend, factory in GRAB_BACKENDS.items():
+        if backend in X11_GRAB_BACKENDS and platform.system() != "Linux":
+            continue
+        try:
+            return factory()
+        except (OSError, AttributeError):
+            continue
+    return PyAutoGuiGrabber()
+
+
+def monitor_containing(monitors, point):
+    """The monitor (x, y, width, height) that contains point (x, y), or None"""
+    px, py = point
+    for monitor in monitors:
+        x, y, width, height = monitor
+        if x <= px < x + width and y <= py < y + height:
+            return monitor
+    return None
+
+
+def monitor_for_region(monitors, region):
+    """The monitor sharing the most area with region, or None if it is on none"""
+    rx, ry, rwidth, rheight = region
+    best, best_area = None, 0
+    for monitor in monitors:
+        x, y, width, height = monitor
+        overlap_width = min(x + width, rx + rwidth) - max(x, rx)
+        overlap_height = min(y + height, ry + rheight) - max(y, ry)
+        if overlap_width > 0 and overlap_height > 0 and overlap_width * overlap_height > best_area:
+            best, best_area = monitor, overlap_width * overlap_height
+    return best
+
+
+def scale_region(region, scale):
+    """Map a logical (x, y, width, height) to physical pixels"""
+    return tuple(int(round(value * scale)) for value in region)
+
+
+def enable_dpi_awareness():
+    """Make the process DPI aware on Windows, before any window geometry is read.
+    
+    pyautogui does this itself when it is first imported, which happens
+    lazily on the first grab; doing it at startup keeps GetWindowRect in
+    the same (physical) pixels for every capture.
+    """
+    if platform.system() != "Windows":
+        return
+    try:
+        ctypes.windll.shcore.SetProcessDpiAwareness(2)  # Per-monitor aware
+    except (AttributeError, OSError):
+        try:
+            ctypes.windll.user32.SetProcessDPIAware()
+        except (AttributeError, OSError):
+            pass
+
+
+def display_scale():
+    """Physical pixels per logical unit of the window bounds get_window_info reports.
+    
+    Only Windows needs this: a process that is not DPI aware gets scaled
+    (logical) rectangles from GetWindowRect, while the grab works in
+    physical pixels. X11 reports device pixels, and on macOS both the
+    window bounds and the grab region are in points. It is 1.0 once
+    enable_dpi_awareness has run; awareness can change during the process
+    (pyautogui sets it on import), so callers should not cache it.
+    """
+    if platform.system() != "Windows":
+        return 1.0
+    try:
+        user32 = ctypes.windll.user32
+        gdi32 = ctypes.windll.gdi32
+        dc = user32.GetDC(None)
+        try:
+            logical = gdi32.GetDeviceCaps(dc, 8)  # HORZRES
+            physical = gdi32.GetDeviceCaps(dc, 118)  # DESKTOPHORZRES
+        finally:
+            user32.ReleaseDC(None, dc)
+    except (AttributeError, OSError):
+        return 1.0
+    return physical / logical if logical > 0 and physical > 0 else 1.0
+
+
+@lru_cache(maxsize=None)
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis as an n x n matrix"""
+    import numpy as np
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+def perceptual_hash(image):
+    """64-bit DCT perceptual hash of image as an int.
+    
+    The image is reduced to 32x32 grayscale, transformed with a 2D DCT
+    (two matrix products), and the 8x8 lowest frequencies (without the DC
+    term) are compared against their median.
+    """
+    import numpy as np
+    pixels = np.asarray(image.convert("L").resize((32, 32), Image.BOX), dtype=np.float64)
+    basis = _dct_matrix(32)
+    dct = basis @ pixels @ basis.T
+    low = dct[:8, :8].ravel()[1:]
+    bits = np.append(low > np.median(low), False)
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def dedup_signature(image, size=256):
+    """Grayscale pixels of image shrunk to fit in size x size, as a uint8 array.
+    
+    At 256 pixels a changed glyph of a 1080p window still moves its
+    signature pixels by tens of grey levels, while the array is small
+    enough to keep several per window title.
+    """
+    import numpy as np
+    scale = min(1.0, size / max(image.size))
+    gray = image.convert("L")
+    if scale < 1.0:
+        gray = gray.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.BOX)
+    return np.asarray(gray)
+
+
+class DuplicateDetector:
+    """Near-duplicate lookup of recent captures by window title.
+    
+    Remembers the dedup_signature and backend answer of the last
+    window_size captures for each of the max_titles most recent window
+    titles. A capture is a duplicate of one of them when no signature
+    pixel differs by more than threshold grey levels. The maximum, not an
+    average, is compared, so anti-aliasing, dithering or compression
+    noise stays under a small threshold while an edited field or a line
+    of new text anywhere in the window does not. 0 only reuses identical
+    signatures.
+    """
+    def __init__(self, threshold=8, window_size=8, max_titles=64):
+        self.threshold = threshold
+        self.window_size = window_size
+        self.max_titles = max_titles
+        self.recent = OrderedDict()  # title -> deque of (signature, api_response)
+        self.lookups = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, title, signature):
+        """Return the remembered answer for a near-duplicate, or None"""
+        import numpy as np
+        with self._lock:
+            self.lookups += 1
+            entries = self.recent.get(title)
+            if not entries:
+                return None
+            self.recent.move_to_end(title)
+            entries = list(entries)
+        for entry_signature, api_response in reversed(entries):
+            if entry_signature.shape != signature.shape:
+                continue
+            difference = np.abs(entry_signature.astype(np.int16) - signature.astype(np.int16)).max()
+            if difference <= self.threshold:
+                with self._lock:
+                    self.hits += 1
+                return api_response
+        return None
+
+    def remember(self, title, signature, api_response):
+        with self._lock:
+            entries = self.recent.get(title)
+            if entries is None:
+                entries = self.recent[title] = deque(maxlen=self.window_size)
+            self.recent.move_to_end(title)
+            entries.append((signature, api_response))
+            while len(self.recent) > self.max_titles:
+                self.recent.popitem(last=False)
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+class ResponseCache:
+    """Persistent, content-addressed cache of backend answers in SQLite.
+    
+    Entries are keyed by the SHA-256 of the encoded upload bytes together
+    with the prompt and endpoint, so a restart or an identical re-capture
+    returns the stored assistant_message without any request. Entries
+    older than max_age seconds are dropped, and the least recently used
+    ones are evicted once the stored answers exceed max_bytes.
+    """
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # A lost last_used update after a crash is harmless; skip per-commit fsync
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, assistant_message TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def key(encoded, prompt, endpoint, context=""):
+        """Cache key of an upload; context tells apart identical bytes that
+        mean different things (e.g. the same crop of different keyframes)"""
+        digest = hashlib.sha256(encoded).hexdigest()
+        return hashlib.sha256(f"{digest}\0{prompt}\0{endpoint}\0{context}".encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached assistant_message for key, or None"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT assistant_message FROM responses WHERE key = ? AND created >= ?",
+                (key, now - self.max_age)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key, assistant_message):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, assistant_message, len(assistant_message.encode()), now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used until under max_bytes"""
+        removed = self._db.execute(
+            "DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,)
+        ).rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            for key, size in self._db.execute(
+                "SELECT key, size FROM responses ORDER BY last_used"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+        self.evictions += removed
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+FSYNC_POLICIES = ("never", "batch", "always")
+
+
+class PayloadJournal:
+    """Rotating JSON-lines journal of the requests sent to the backend.
+    
+    append() only queues the record and returns; a background thread
+    writes compact JSON lines. Images are referenced by their archive
+    path and the SHA-256 of the uploaded bytes (hashed on the writer
+    thread). With inline=True the uploaded image is also embedded as
+    base64, for debugging. When the file would exceed max_bytes it is
+    rotated to path.1 ... path.<backups>, dropping the oldest. fsync is
+    "never", "batch" (after each burst of records is written) or
+    "always" (after every record). If the queue is full, records are
+    dropped and counted rather than blocking the caller.
+    """
+    def __init__(self, path, max_bytes=16 * 1024 * 1024, backups=3, fsync="batch", inline=False,
+                 max_pending=64, on_error=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.fsync = fsync
+        self.inline = inline
+        self.on_error = on_error or (lambda error: None)
+        self.records = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.rotations = 0
+        self._queue = queue.Queue(max_pending)
+        self._file = None
+        self._thread = threading.Thread(target=self._run, name="payload-journal", daemon=True)
+        self._thread.start()
+
+    def append(self, record, image_bytes=None):
+        """Queue record for writing; image_bytes are hashed (and inlined) on the writer thread"""
+        try:
+            self._queue.put_nowait((record, image_bytes))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Write whatever else is already waiting before syncing once
+            while item is not None:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            try:
+                for entry in batch:
+                    if entry is not None:
+                        self._write(*entry)
+                if self._file is not None:
+                    self._file.flush()
+                    if self.fsync == "batch":
+                        os.fsync(self._file.fileno())
+            except OSError as e:
+                self.on_error(e)
+            if batch[-1] is None:
+                if self._file is not None:
+                    self._file.close()
+                return
+
+    def _write(self, record, image_bytes):
+        if image_bytes is not None:
+            image = record.setdefault("image", {})
+            image["sha256"] = hashlib.sha256(image_bytes).hexdigest()
+            image["bytes"] = len(image_bytes)
+            if self.inline:
+                image["base64"] = base64.b64encode(image_bytes).decode()
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        if self._file.tell() and self._file.tell() + len(line) > self.max_bytes:
+            self._rotate()
+        self._file.write(line)
+        if self.fsync == "always":
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.records += 1
+        self.bytes_written += len(line)
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab")
+        self.rotations += 1
+
+    def close(self):
+        """Write everything still queued, then stop the writer"""
+        self._queue.put(None)
+        self._thread.join()
+
+
+class ScreenshotStore:
+    """Content-addressed archive of full-resolution captures, with retention.
+    
+    Files are named by the SHA-256 of their encoded bytes, so identical
+    captures are stored once and names never collide. A small SQLite index
+    next to them records size, window title and first/last use. A
+    background thread garbage-collects entries older than max_age seconds
+    and, least recently used first, trims the store to max_bytes and
+    max_count; captures used by this session are never collected while it
+    runs. Per-launch es_screenshots_<timestamp> directories left by older
+    versions are removed once they are older than max_age.
+    """
+    LEGACY_DIR = re.compile(r"es_screenshots_\d{8}_\d{6}$")
+
+    def __init__(self, directory, max_age=14 * 24 * 3600, max_bytes=2048 * 1024 * 1024, max_count=5000,
+                 gc_interval=600):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.gc_interval = gc_interval
+        self.started_at = time.time()
+        self.stored = 0
+        self.deduplicated = 0
+        self.collected = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            " name TEXT PRIMARY KEY, size INTEGER NOT NULL, title TEXT,"
+            " created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS objects_last_used ON objects (last_used)")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._gc_loop, name="store-gc", daemon=True)
+        self._thread.start()
+
+    def put(self, data, extension, title=None):
+        """Store encoded image bytes and return their path; existing content is reused"""
+        name = hashlib.sha256(data).hexdigest() + extension
+        path = os.path.join(self.directory, name)
+        now = time.time()
+        with self._lock:
+            known = self._db.execute("SELECT 1 FROM objects WHERE name = ?", (name,)).fetchone()
+            if known and os.path.exists(path):
+                self._db.execute("UPDATE objects SET last_used = ? WHERE name = ?", (now, name))
+                self.deduplicated += 1
+                return path
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self._db.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)", (name, len(data), title, now, now)
+            )
+            self.stored += 1
+        return path
+
+    def _gc_loop(self):
+        while True:
+            try:
+                self.collect()
+            except (OSError, sqlite3.Error) as e:
+                print("Error collecting old screenshots:", str(e))
+            if self._stop.wait(self.gc_interval):
+                return
+
+    def collect(self):
+        """Apply the retention policy now; returns the number of files removed"""
+        now = time.time()
+        # Entries this session has used are kept while it runs
+        expiry = min(now - self.max_age, self.started_at)
+        with self._lock:
+            doomed = [name for (name,) in self._db.execute(
+                "SELECT name FROM objects WHERE last_used < ?", (expiry,)
+            )]
+            count, total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects WHERE last_used >= ?", (expiry,)
+            ).fetchone()
+            if count > self.max_count or total > self.max_bytes:
+                for name, size in self._db.execute(
+                    "SELECT name, size FROM objects WHERE last_used >= ? AND last_used < ? ORDER BY last_used",
+                    (expiry, self.started_at)
+                ).fetchall():
+                    if count <= self.max_count and total <= self.max_bytes:
+                        break
+                    doomed.append(name)
+                    count -= 1
+                    total -= size
+            for name in doomed:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                self._db.execute("DELETE FROM objects WHERE name = ?", (name,))
+            self.collected += len(doomed)
+        self._remove_legacy_dirs(now)
+        return len(doomed)
+
+    def _remove_legacy_dirs(self, now):
+        import shutil
+        
+        for entry in os.scandir(tempfile.gettempdir()):
+            if (entry.is_dir(follow_symlinks=False) and self.LEGACY_DIR.match(entry.name)
+                    and entry.stat().st_mtime < now - self.max_age):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            count, total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects"
+            ).fetchone()
+        return {
+            "entries": count,
+            "bytes": total,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "collected": self.collected,
+        }
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        with self._lock:
+            self._db.close()
+
+
+class TileDeltaTracker:
+    """Finds what changed since the previous capture of the same window.
+    
+    Frames are split into tile_size squares and compared with the last
+    frame captured for the same (title, bounds) key in one vectorized pass.
+    diff() returns the changed tiles and their bounding box, a result with
+    box None when nothing changed, or None when a full keyframe should be
+    sent instead: the first capture of a window, every keyframe_interval
+    captures, after a size change, or when so much changed that a crop
+    would not save anything. Deltas name their keyframe by a hash of its
+    pixels, so they are never mistaken for deltas against another one.
+    """
+    def __init__(self, tile_size=32, keyframe_interval=10, tolerance=8, max_changed_ratio=0.5,
+                 max_windows=16):
+        self.tile_size = tile_size
+        self.keyframe_interval = keyframe_interval
+        self.tolerance = tolerance
+        self.max_changed_ratio = max_changed_ratio
+        self.max_windows = max_windows
+        self.frames = OrderedDict()  # key -> (pixels, captures since keyframe, keyframe id)
+        self.keyframes = 0
+        self.unchanged_frames = 0
+        self.delta_frames = 0
+        self.full_pixels = 0
+        self.sent_pixels = 0
+        self._lock = threading.Lock()
+
+    def changed_tiles(self, previous, current):
+        """Boolean (rows, cols) grid of tiles whose pixels differ beyond tolerance"""
+        import numpy as np
+        t = self.tile_size
+        height, width = current.shape[:2]
+        changed = (np.abs(current - previous) > self.tolerance).any(axis=2)
+        rows, cols = -(-height // t), -(-width // t)
+        padded = np.zeros((rows * t, cols * t), dtype=bool)
+        padded[:height, :width] = changed
+        return padded.reshape(rows, t, cols, t).any(axis=(1, 3))
+
+    def diff(self, key, image):
+        """Compare image with the last frame for key and remember it.
+        
+        Returns {"box": (x, y, width, height), "tiles": [(x, y), ...],
+        "tile_size": n, "frame_size": (width, height), "keyframe": id}, the
+        same with box None and no tiles if nothing changed, or None for a
+        keyframe.
+        """
+        import numpy as np
+        current = np.asarray(image.convert("RGB"), dtype=np.int16)
+        height, width = current.shape[:2]
+        with self._lock:
+            previous, since_keyframe, keyframe_id = self.frames.pop(key, (None, 0, None))
+            self.frames[key] = (current, since_keyframe + 1, keyframe_id)
+            while len(self.frames) > self.max_windows:
+                self.frames.popitem(last=False)
+        
+        keyframe = (
+            previous is None
+            or previous.shape != current.shape
+            or since_keyframe >= self.keyframe_interval
+        )
+        if not keyframe:
+            tiles = self.changed_tiles(previous, current)
+            rows, cols = np.nonzero(tiles)
+            if len(rows) > self.max_changed_ratio * tiles.size:
+                keyframe = True
+        if keyframe:
+            with self._lock:
+                self.frames[key] = (current, 1, hashlib.sha256(current.tobytes()).hexdigest()[:16])
+                self.keyframes += 1
+                self.full_pixels += width * height
+                self.sent_pixels += width * height
+            return None
+        
+        t = self.tile_size
+        if len(rows) == 0:
+            with self._lock:
+                self.unchanged_frames += 1
+                self.full_pixels += width * height
+            return {"box": None, "tiles": [], "tile_size": t, "frame_size": (width, height),
+                    "keyframe": keyframe_id}
+        left, top = int(cols.min()) * t, int(rows.min()) * t
+        right = min((int(cols.max()) + 1) * t, width)
+        bottom = min((int(rows.max()) + 1) * t, height)
+        with self._lock:
+            self.delta_frames += 1
+            self.full_pixels += width * height
+            self.sent_pixels += (right - left) * (bottom - top)
+        return {
+            "box": (left, top, right - left, bottom - top),
+            "tiles": [(int(col) * t, int(row) * t) for row, col in zip(rows, cols)],
+            "tile_size": t,
+            "frame_size": (width, height),
+            "keyframe": keyframe_id,
+        }
+
+
+class CaptureRecord:
+    """Compact metadata for one capture; the full image stays on disk at path"""
+    __slots__ = ("title", "timestamp", "path", "width", "height", "upload_bytes", "api_response")
+
+    def __init__(self, title, timestamp, path, width, height, upload_bytes=0, api_response=None):
+        self.title = title
+        self.timestamp = timestamp
+        self.path = path
+        self.width = width
+        self.height = height
+        self.upload_bytes = upload_bytes
+        self.api_response = api_response
+
+    def nbytes(self):
+        """Approximate memory held by this record and the strings it references"""
+        size = sys.getsizeof(self)
+        for name in ("title", "timestamp", "path", "api_response"):
+            value = getattr(self, name)
+            if value is not None:
+                size += sys.getsizeof(value)
+        return size
+
+
+class ImageCache:
+    """LRU cache of full-resolution images loaded lazily from disk.
+
+    Images are evicted least-recently-used first once the decoded size of
+    everything cached exceeds budget_bytes. An image larger than the whole
+    budget is returned to the caller but never cached.
+    """
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def image_nbytes(image):
+        return image.width * image.height * len(image.getbands())
+
+    def put(self, path, image):
+        nbytes = self.image_nbytes(image)
+        with self._lock:
+            if path in self._images:
+                self.current_bytes -= self.image_nbytes(self._images.pop(path))
+            if nbytes > self.budget_bytes:
+                return
+            self._images[path] = image
+            self.current_bytes += nbytes
+            self._evict()
+
+    def get(self, path):
+        """Return the image at path, loading it from disk on a miss"""
+        with self._lock:
+            image = self._images.get(path)
+            if image is not None:
+                self._images.move_to_end(path)
+                self.hits += 1
+                return image
+            self.misses += 1
+        image = Image.open(path)
+        image.load()
+        self.put(path, image)
+        return image
+
+    def set_budget(self, budget_bytes):
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict()
+
+    def _evict(self):
+        while self._images and self.current_bytes > self.budget_bytes:
+            _, image = self._images.popitem(last=False)
+            self.current_bytes -= self.image_nbytes(image)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._images),
+                "bytes": self.current_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+# One alternation scanned left to right: "**" is tried before "*" at each
+# position, so italics are never matched inside a bold span
+INLINE_MARKDOWN = re.compile(
+    r"\*\*(?P<bold>.+?)\*\*"
+    r"|\*(?P<italic>[^*]+?)\*"
+    r"|\[(?P<link>[^\]]*)\]\([^)]*\)"
+)
+BLOCK_PREFIXES = (("# ", "heading1"), ("## ", "heading2"), ("### ", "heading3"))
+
+
+def inline_markdown_segments(line, segments):
+    """Append the (text, tag) segments of one line's bold, italic and links"""
+    position = 0
+    for match in INLINE_MARKDOWN.finditer(line):
+        if match.start() > position:
+            segments.append((line[position:match.start()], None))
+        tag = match.lastgroup
+        segments.append((match.group(tag), tag))
+        position = match.end()
+    if position < len(line):
+        segments.append((line[position:], None))
+
+
+def markdown_segments(text, in_code_block=False):
+    """Tokenize Markdown into a list of (text, tag) segments in one pass.
+    
+    Code blocks and line breaks are folded into their neighbouring segment,
+    so the widget gets one insert argument per run rather than per line.
+    """
+    segments = []
+    code_lines = [] if in_code_block else None
+    
+    for line in text.split('\n'):
+        stripped = line.strip()
+        # Code blocks
+        if stripped.startswith('```'):
+            if code_lines is None:
+                code_lines = []
+            else:  # End of code block
+                segments.append(("".join(code_lines), "code"))
+                segments.append(('\n', None))
+                code_lines = None
+            continue
+        
+        if code_lines is not None:
+            code_lines.append(line + '\n')
+            continue
+        
+        # Headings
+        for prefix, tag in BLOCK_PREFIXES:
+            if stripped.startswith(prefix):
+                segments.append((line[len(prefix):] + '\n', tag))
+                break
+        else:
+            # Bullet lists
+            if stripped.startswith('- ') or stripped.startswith('* '):
+                segments.append(('• ' + line[2:].strip() + '\n', "bullet"))
+                continue
+            # Inline formatting
+            inline_markdown_segments(line, segments)
+            if segments and segments[-1][1] is None:
+                segments[-1] = (segments[-1][0] + '\n', None)
+            else:
+                segments.append(('\n', None))
+    
+    if code_lines:  # Unterminated code block
+        segments.append(("".join(code_lines), "code"))
+    return segments
+
+
 class MarkdownText(tk.Text):
     """A Text widget with improved Markdown rendering capabilities"""
     def __init__(self, *args, **kwargs):
@@ -30,96 +2207,492 @@ class MarkdownText(tk.Text):
         self.tag_configure("link", foreground="blue", underline=1)
 
     def insert_markdown(self, text):
-        """Parse and insert markdown text"""
+        """Parse and insert markdown text; append_markdown() can continue it"""
         # Clear current content
         self.delete(1.0, tk.END)
+        self.mark_set("stream_tail", "1.0")
+        self.mark_gravity("stream_tail", tk.LEFT)
+        self.stream_tail = ""  # Unfinished last line, re-rendered on every append
+        self.stream_in_code = False
+        self.append_markdown(text)
+    
+    def append_markdown(self, text):
+        """Append streamed markdown text, re-tokenizing only the unfinished last line.
         
-        # Process lines
-        code_block = False
-        bullet_list = False
+        Complete lines are rendered once and kept; the "stream_tail" mark
+        sits after them, and everything from it to the end is replaced.
+        """
+        text = self.stream_tail + text
+        cut = text.rfind('\n') + 1
+        self.delete("stream_tail", tk.END)
+        if cut:
+            complete = text[:cut - 1]
+            self.insert_segments(markdown_segments(complete, self.stream_in_code))
+            fences = sum(1 for line in complete.split('\n') if line.strip().startswith('```'))
+            self.stream_in_code ^= fences % 2 == 1
+            self.mark_set("stream_tail", "end-1c")
+        self.stream_tail = text[cut:]
+        if self.stream_tail:
+            self.insert_segments(markdown_segments(self.stream_tail, self.stream_in_code))
+    
+    def insert_segments(self, segments):
+        """Insert (text, tag) segments at the end in a single Tcl call"""
+        args = []
+        for chunk, tag in segments:
+            args.append(chunk)
+            args.append(tag or ())
+        if args:
+            self.insert(tk.END, *args)
+
+class ScreenshotCard(ttk.Frame):
+    """A gallery card showing one capture: API response, thumbnail and title.
+
+    The widgets are built once and can be re-bound to another record with
+    show(), so a virtualized gallery can recycle cards while scrolling.
+    """
+    def __init__(self, parent, app):
+        super().__init__(parent)
+        self.app = app
+        self.record = None
+
+        # --- API Response Card ---
+        response_card = ttk.Frame(self, relief="solid", borderwidth=1, padding=10)
+        response_card.pack(fill=tk.X, padx=5, pady=5)
+
+        # --- Scrollable Text Container ---
+        text_frame = ttk.Frame(response_card)
+        text_frame.pack(fill=tk.BOTH, expand=True)
+
+        # --- Scrollbars ---
+        v_scrollbar = ttk.Scrollbar(text_frame, orient="vertical")
         
-        for line in text.split('\n'):
-            # Code blocks
-            if line.strip().startswith('```'):
-                code_block = not code_block
-                if not code_block:  # End of code block
-                    self.insert(tk.END, '\n')
-                continue
-            
-            if code_block:
-                self.insert(tk.END, line + '\n', "code")
-                continue
-            
-            # Headings
-            if line.strip().startswith('# '):
-                self.insert(tk.END, line[2:] + '\n', "heading1")
-                continue
-            elif line.strip().startswith('## '):
-                self.insert(tk.END, line[3:] + '\n', "heading2")
-                continue
-            elif line.strip().startswith('### '):
-                self.insert(tk.END, line[4:] + '\n', "heading3")
-                continue
-            
-            # Bullet lists
-            if line.strip().startswith('- ') or line.strip().startswith('* '):
-                bullet_list = True
-                self.insert(tk.END, '• ' + line[2:].strip() + '\n', "bullet")
-                continue
-            
-            # Process inline formatting
-            self.process_inline_markdown(line)
-            self.insert(tk.END, '\n')
-            bullet_list = False
-    
-    def process_inline_markdown(self, line):
-        """Process inline markdown elements like bold, italic, and links"""
-        line_remaining = line
-        
-        while line_remaining:
-            # Find the first occurrence of each pattern
-            bold_match = re.search(r'\*\*(.*?)\*\*', line_remaining)
-            italic_match = re.search(r'\*(.*?)\*', line_remaining)
-            link_match = re.search(r'\[(.*?)\]\((.*?)\)', line_remaining)
-            
-            # Determine which pattern comes first, if any
-            matches = []
-            if bold_match:
-                matches.append(('bold', bold_match.start(), bold_match.end(), bold_match.group(1)))
-            if italic_match:
-                matches.append(('italic', italic_match.start(), italic_match.end(), italic_match.group(1)))
-            if link_match:
-                matches.append(('link', link_match.start(), link_match.end(), link_match.group(1)))
-            
-            # If no matches, insert remaining text and exit
-            if not matches:
-                self.insert(tk.END, line_remaining)
+        # --- Response Content with Markdown Formatting ---
+        self.response_content = MarkdownText(
+            text_frame,
+            wrap=tk.WORD,  # Wrap words to avoid horizontal scrolling unless necessary
+            height=20,  # Default height
+            width=70,
+            font=("Segoe UI", 10),
+            bg="#DBEAF7",
+            relief=tk.FLAT,
+            padx=10,
+            pady=5,
+            yscrollcommand=v_scrollbar.set,
+        )
+        v_scrollbar.config(command=self.response_content.yview)
+        
+        self.response_content.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
+        v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # --- Screenshot Below (packed only when there is an image) ---
+        self.image_frame = ttk.Frame(self, borderwidth=1, relief="solid")
+        self.photo_released = False  # Thumbnail dropped to save memory, space kept
+        self.image_label = ttk.Label(self.image_frame)
+        self.image_label.pack()
+        
+        # --- Header for Open Button ---
+        self.title_frame = ttk.Frame(self)
+        self.title_frame.pack(fill=tk.X)
+        
+        self.title_label = ttk.Label(
+            self.title_frame,
+            font=("Arial", 10, "bold"),
+            foreground=app.colors["primary"]
+        )
+        self.title_label.pack(side=tk.LEFT, pady=5)
+        
+        self.open_button = ttk.Button(self.title_frame, text="Open Image")
+        self.open_button.pack(side=tk.RIGHT, padx=5)
+
+    def show(self, record, photo):
+        """Bind the card to record, displaying photo as its thumbnail"""
+        self.record = record
+        
+        self.show_response(record.api_response)
+        self.set_photo(photo)
+        self.title_label.configure(text=f"{record.title} - {record.timestamp}")
+        self.open_button.configure(command=lambda path=record.path: self.app.open_screenshot(path))
+
+    def set_photo(self, photo):
+        """Display photo as the thumbnail; None hides the image frame"""
+        self.photo_released = False
+        self.image_frame.pack_propagate(True)
+        if photo is not None:
+            self.image_label.configure(image=photo)
+            self.image_label.image = photo
+            self.image_frame.pack(pady=5, before=self.title_frame)
+        else:
+            self.image_label.configure(image="")
+            self.image_label.image = None
+            self.image_frame.pack_forget()
+
+    def release_photo(self):
+        """Drop the thumbnail but keep its space, so the list doesn't move.
+        Returns the bytes the PhotoImage held."""
+        photo = self.image_label.image
+        if photo is None:
+            return 0
+        self.image_frame.configure(width=self.image_frame.winfo_width(),
+                                   height=self.image_frame.winfo_height())
+        self.image_frame.pack_propagate(False)
+        self.image_label.configure(image="")
+        self.image_label.image = None
+        self.photo_released = True
+        return photo.width() * photo.height() * 4
+
+    def show_response(self, api_response):
+        """Render api_response; "" means a streamed answer hasn't started yet"""
+        if api_response == "":
+            response_text = "Waiting for response…"
+        else:
+            response_text = api_response or "No API response available"
+        self.response_content.config(state=tk.NORMAL)
+        self.response_content.insert_markdown(response_text)
+        self.response_content.config(state=tk.DISABLED)  # Make it read-only
+
+    def append_response(self, text):
+        """Append a streamed piece of the API response"""
+        self.response_content.config(state=tk.NORMAL)
+        self.response_content.append_markdown(text)
+        self.response_content.config(state=tk.DISABLED)
+
+
+class VirtualGallery:
+    """Virtualized screenshot list drawn directly on the main canvas.
+
+    Only records in or near the viewport get a ScreenshotCard. Cards that
+    scroll out of range are hidden and recycled for the records scrolling
+    in, and thumbnails are kept in a bounded LRU cache. Card heights are
+    derived from the stored image size, so the scroll region is known
+    without laying out (or loading) off-screen cards.
+    """
+    card_gap = 15
+    card_padx = 10
+
+    def __init__(self, app, canvas, max_thumbnails=64):
+        self.app = app
+        self.canvas = canvas
+        self.max_thumbnails = max_thumbnails
+        self.offsets = []  # Top y of each card, parallel to app.screenshots
+        self.total_height = 0
+        self.base_height = None  # Card height without a thumbnail, measured once
+        self.active = {}  # record -> (card, canvas window id)
+        self.pool = []  # Hidden (card, canvas window id) pairs ready for reuse
+        self.thumbnails = OrderedDict()  # path -> PhotoImage
+        self._refresh_pending = None
+
+    def card_height(self, record):
+        thumb_height = self.app.thumbnail_size(record.width, record.height)[1] if record.width else 0
+        # Image frame adds pady=5 on both sides plus a 1px border
+        return self.base_height + (thumb_height + 12 if thumb_height else 0) + self.card_gap
+
+    def insert(self, index):
+        """Account for a record inserted at index in app.screenshots"""
+        if self.base_height is None:
+            self.measure_base_height()
+        height = self.card_height(self.app.screenshots[index])
+        top = self.offsets[index] if index < len(self.offsets) else self.total_height
+        self.offsets[index:] = [top] + [y + height for y in self.offsets[index:]]
+        self.total_height += height
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), self.total_height))
+        self.schedule_refresh()
+
+    def measure_base_height(self):
+        card = ScreenshotCard(self.canvas, self.app)
+        window_id = self.canvas.create_window(0, 0, window=card, anchor=tk.NW, state="hidden")
+        card.update_idletasks()
+        self.base_height = card.winfo_reqheight()
+        self.pool.append((card, window_id))
+
+    def relayout(self):
+        """Recompute all card offsets and the scroll region, then refresh the viewport"""
+        if self.base_height is None:
+            self.measure_base_height()
+        self.offsets = []
+        y = 0
+        for record in self.app.screenshots:
+            self.offsets.append(y)
+            y += self.card_height(record)
+        self.total_height = y
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), self.total_height))
+        self.refresh()
+
+    def schedule_refresh(self):
+        """Refresh once the current burst of scroll events has been handled"""
+        if self._refresh_pending is None:
+            self._refresh_pending = self.canvas.after_idle(self.refresh)
+
+    def refresh(self):
+        """Create, move or recycle cards so exactly the visible range has widgets"""
+        self._refresh_pending = None
+        records = self.app.screenshots
+        view_height = max(self.canvas.winfo_height(), 1)
+        top = self.canvas.canvasy(0)
+        # Overscan one viewport above and below so short scrolls don't flash
+        first = max(bisect.bisect_right(self.offsets, top - view_height) - 1, 0)
+        last = bisect.bisect_left(self.offsets, top + 2 * view_height)
+        visible = {records[i]: i for i in range(first, min(last, len(records)))}
+        
+        for record in list(self.active):
+            if record not in visible:
+                card, window_id = self.active.pop(record)
+                self.canvas.itemconfigure(window_id, state="hidden")
+                self.pool.append((card, window_id))
+        
+        width = max(self.canvas.winfo_width() - 2 * self.card_padx, 1)
+        for record, i in visible.items():
+            entry = self.active.get(record)
+            if entry is None:
+                entry = self.pool.pop() if self.pool else self.new_card()
+                entry[0].show(record, self.thumbnail(record))
+                self.active[record] = entry
+            self.canvas.coords(entry[1], self.card_padx, self.offsets[i])
+            self.canvas.itemconfigure(entry[1], state="normal", width=width)
+
+    def new_card(self):
+        card = ScreenshotCard(self.canvas, self.app)
+        window_id = self.canvas.create_window(0, 0, window=card, anchor=tk.NW, state="hidden")
+        return card, window_id
+
+    def thumbnail(self, record):
+        photo = self.thumbnails.get(record.path)
+        if photo is not None:
+            self.thumbnails.move_to_end(record.path)
+            return photo
+        photo = self.app.make_thumbnail(record)
+        if photo is None:
+            return None
+        self.thumbnails[record.path] = photo
+        # Least recently shown first; thumbnails of cards on screen stay
+        shown = {record.path for record in self.active}
+        for path in list(self.thumbnails):
+            if (len(self.thumbnails) <= self.max_thumbnails
+                    and self.app.thumbnail_bytes <= self.app.thumbnail_budget):
                 break
-            
-            # Sort matches by start position
-            matches.sort(key=lambda x: x[1])
-            match_type, start, end, content = matches[0]
-            
-            # Insert text before the match
-            if start > 0:
-                self.insert(tk.END, line_remaining[:start])
-            
-            # Insert matched content with appropriate tag
-            self.insert(tk.END, content, match_type)
-            
-            # Update remaining line
-            line_remaining = line_remaining[end:]
+            if path not in shown and path != record.path:
+                evicted = self.thumbnails.pop(path)
+                self.app.thumbnail_bytes -= evicted.width() * evicted.height() * 4
+        return photo
+
+    def widget_count(self):
+        return len(self.active) + len(self.pool)
+
+
+class IntervalCapture:
+    """Captures the active window periodically, adapting the rate.
+    
+    Each tick submits a capture through the same pipeline as the button.
+    When the pipeline can't take it (a capture is still in progress or the
+    first queue is full) the frame is dropped and counted, never queued.
+    The interval grows while frames come back unchanged (by perceptual
+    hash) or the pipeline falls behind, and shrinks back towards the
+    target rate as soon as something changes.
+    """
+    def __init__(self, app, target_fps=0.5, min_fps=0.05, unchanged_threshold=6):
+        self.app = app
+        self.base_interval = 1 / target_fps
+        self.max_interval = 1 / min_fps
+        self.unchanged_threshold = unchanged_threshold
+        self.interval = self.base_interval
+        self.running = False
+        self.started_at = None
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.last_phash = None
+        self._after_id = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.started_at = time.monotonic()
+        self.submitted = self.dropped = self.completed = 0
+        self.interval = self.base_interval
+        self.last_phash = None
+        self.tick()
+
+    def stop(self):
+        self.running = False
+        if self._after_id is not None:
+            self.app.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def tick(self):
+        """Submit one frame (on the Tk thread) and schedule the next"""
+        if not self.running:
+            return
+        if self.app.submit_capture(CaptureJob(interval=True)):
+            self.submitted += 1
+            # More frames in flight than stages means uploads are falling behind
+            if self.app.pipeline.in_flight > len(self.app.pipeline.stages):
+                self.slow_down()
+        else:
+            self.dropped += 1
+            self.slow_down()
+        self._after_id = self.app.root.after(int(self.interval * 1000), self.tick)
+
+    def slow_down(self, factor=1.5):
+        self.interval = min(self.interval * factor, self.max_interval)
+
+    def frame_done(self, job):
+        """Called on the Tk thread for every interval frame that completes"""
+        self.completed += 1
+        unchanged = job.duplicate or job.cache_hit
+        if job.phash is not None and self.last_phash is not None:
+            unchanged = unchanged or (job.phash ^ self.last_phash).bit_count() <= self.unchanged_threshold
+        if job.phash is not None:
+            self.last_phash = job.phash
+        if unchanged:
+            self.slow_down()
+        else:
+            self.interval = max(self.interval / 2, self.base_interval)
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        return {
+            "running": self.running,
+            "target_fps": 1 / self.base_interval,
+            "current_fps": 1 / self.interval,
+            "achieved_fps": self.completed / elapsed if elapsed else 0.0,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+        }
+
+
+class UiDispatcher:
+    """Runs UI updates requested from any thread on the Tk loop.
+    
+    Tk widgets may only be touched from the thread running mainloop.
+    Worker threads queue calls with call() or coalesce() and return at
+    once; only the Tk thread schedules drains. It polls the queue once per
+    frame while there is work and backs off to idle_ms when there is none,
+    and a call made on the Tk thread itself (a capture starting) brings
+    the poll back to the frame rate. coalesce() keeps only the latest call
+    per key until the next drain, so a burst of status messages or
+    scroll-region updates costs one Tk update.
+    """
+    def __init__(self, root, frame_ms=16, idle_ms=500):
+        self.root = root
+        self.frame_ms = frame_ms
+        self.idle_ms = idle_ms
+        self.queued = 0
+        self.coalesced = 0
+        self.drains = 0
+        self._calls = []  # (func, args) in request order
+        self._keyed = {}  # coalesce key -> index in self._calls
+        self._lock = threading.Lock()
+        self._tk_thread = None
+        self._delay = frame_ms
+        self._after_id = None
+
+    def start(self):
+        """Start polling (on the Tk thread)"""
+        if self._after_id is None:
+            self._tk_thread = threading.get_ident()
+            self._delay = self.frame_ms
+            self._after_id = self.root.after(self._delay, self.drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def wake(self):
+        """Poll at the frame rate again; a no-op off the Tk thread"""
+        if (self._after_id is not None and self._delay > self.frame_ms
+                and threading.get_ident() == self._tk_thread):
+            self.root.after_cancel(self._after_id)
+            self._delay = self.frame_ms
+            self._after_id = self.root.after(self._delay, self.drain)
+
+    def call(self, func, *args):
+        """Run func(*args) on the Tk thread at the next frame"""
+        with self._lock:
+            self._calls.append((func, args))
+            self.queued += 1
+        self.wake()
+
+    def coalesce(self, key, func, *args):
+        """Like call(), but replace a call with the same key still waiting"""
+        with self._lock:
+            index = self._keyed.get(key)
+            if index is not None:
+                self._calls[index] = (func, args)
+                self.coalesced += 1
+            else:
+                self._keyed[key] = len(self._calls)
+                self._calls.append((func, args))
+                self.queued += 1
+        self.wake()
+
+    def drain(self):
+        """Run everything queued since the last poll (on the Tk thread)"""
+        with self._lock:
+            calls, self._calls = self._calls, []
+            self._keyed = {}
+        if calls:
+            self.drains += 1
+        for func, args in calls:
+            try:
+                func(*args)
+            except Exception:
+                traceback.print_exc()
+        if self._after_id is None:
+            return  # Stopped by one of the calls
+        # Back off while idle: frame_ms, 2x, 4x ... up to idle_ms
+        self._delay = self.frame_ms if calls else min(self._delay * 2, self.idle_ms)
+        self._after_id = self.root.after(self._delay, self.drain)
+
+
+class TimingsPanel:
+    """A small window listing recent per-stage span timings, refreshed every second"""
+    columns = ("count", "last", "p50", "p95")
+
+    def __init__(self, app):
+        self.app = app
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Capture timings")
+        self.tree = ttk.Treeview(self.window, columns=self.columns, height=16)
+        self.tree.heading("#0", text="Stage")
+        self.tree.column("#0", width=200)
+        for column in self.columns:
+            self.tree.heading(column, text=column if column == "count" else f"{column} (ms)")
+            self.tree.column(column, width=80, anchor=tk.E)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.refresh()
+
+    def refresh(self):
+        if not self.window.winfo_exists():
+            return
+        self.tree.delete(*self.tree.get_children())
+        for name, (count, last, p50, p95) in self.app.tracer.recent_stats().items():
+            self.tree.insert("", tk.END, text=name, values=(count, f"{last:.1f}", f"{p50:.1f}", f"{p95:.1f}"))
+        self.window.after(1000, self.refresh)
+
 
 class ScreenshotApp:
-    def __init__(self, root):
+    def __init__(self, root, memory_budget_mb=256, virtual_list=False, encoder=None, transport=None,
+                 hide_timeout=0.5, hide_settle=0.05, grab_backend="auto", dedup_threshold=-1,
+                 dedup_window=8, response_cache_mb=64, response_cache_days=30, delta_mode=False,
+                 keyframe_interval=10, delta_tile_size=32, interval_fps=0.5, interval_min_fps=0.05,
+                 stream_responses=False, tracer=None, metrics_file=None, metrics_port=None,
+                 metrics_interval=10, journal_max_mb=16, journal_backups=3, journal_fsync="batch",
+                 journal_inline=False, store_dir=None, retention_days=14, retention_mb=2048,
+                 retention_count=5000):
         
         self.root = root
         self.root.title("Taro ")
         self.root.geometry("1024x768")
         self.root.resizable(True, True)
+        # The main window is built after the floating button has been drawn
+        self.root.withdraw()
+        self.main_window_built = False
 
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
-        self.payload_file = os.path.join(self.script_dir, "payload.json")
+        self.journal_file = os.path.join(self.script_dir, "payload_journal.jsonl")
+        self.response_cache_file = os.path.join(self.script_dir, "response_cache.sqlite3")
 
         # Define color scheme for a more colorful UI
         self.colors = {
@@ -134,26 +2707,143 @@ class ScreenshotApp:
             "text_light": "#ffffff"
         }
 
-        # Configure ttk styles for a beautiful UI
-        self.configure_styles()
-        self.setup_icon()
-        
-        self.root.configure(bg=self.colors["bg_light"])
-        
-        self.screenshots = []
+        self.screenshots = []  # CaptureRecord entries, newest first
+        self.screenshot_cards = []  # Card frames, parallel to self.screenshots
+        # A quarter of the memory budget is for card thumbnails (~4 bytes a
+        # pixel as PhotoImages), the rest for full-resolution images
+        self.thumbnail_bytes = 0
+        self.thumbnail_budget = memory_budget_mb * 1024 * 1024 // 4
+        self.card_thumbnails = OrderedDict()  # card -> None, least recently on screen first
+        self._thumbnail_refresh = None
+        self.image_cache = ImageCache(memory_budget_mb * 1024 * 1024 - self.thumbnail_budget)
+        self.virtual_list = virtual_list
+        self.gallery = None  # VirtualGallery when virtual_list is enabled
+        self.encoder = encoder or CaptureEncoder()
+        self.transport = transport or ApiTransport()
+        self.stream_responses = stream_responses  # Show the answer as it is generated
+        self.x11_query = None  # X11WindowQuery, created on first use (False if unavailable)
+        self.grab_backend = grab_backend
+        self.grabber = None  # Created on first capture
+        self.last_window_region = None  # Where the last window capture was, for the fallback
+        self.button_region = None  # Where the floating button is on screen
+        # Duplicate suppression, opt-in; a negative threshold turns it off
+        self.deduplicator = (
+            DuplicateDetector(dedup_threshold, dedup_window) if dedup_threshold >= 0 else None
+        )
+        self.interval_capture = IntervalCapture(self, interval_fps, interval_min_fps)
+        # Delta mode uploads only the changed region of repeated window captures
+        self.delta_tracker = (
+            TileDeltaTracker(delta_tile_size, keyframe_interval) if delta_mode else None
+        )
+        self.delta_answers = OrderedDict()  # (title, bounds) -> latest answer, for unchanged frames
+        # The response cache, payload journal and screenshot store touch the
+        # disk, so open_storage() opens them after the first paint
+        self.storage_opened = False
+        self.response_cache = None
+        self.response_cache_options = (response_cache_mb, response_cache_days)
+        self.journal = None
+        self.journal_options = (journal_max_mb, journal_backups, journal_fsync, journal_inline)
+        self.store = None
+        self.store_options = (retention_days, retention_mb, retention_count)
+        self.hide_timeout = hide_timeout  # Upper bound on waiting for our windows to unmap
+        self.hide_settle = hide_settle  # Repaint time for whatever was underneath
+        self.hide_lock = threading.Lock()
+        self.pending_unmaps = set()
+        self.windows_hidden = threading.Event()
         self.is_capturing = False
         self.drag_started = False  # To track if we're dragging
         self.status_message = ""
         self.status_type = "info"
+        # Worker threads never touch Tk directly; their UI updates go through here
+        self.ui = UiDispatcher(root)
+        self.tracer = tracer or Tracer()
+        self.timings_panel = None
         
-        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.temp_dir = os.path.join(tempfile.gettempdir(), f"es_screenshots_{self.timestamp}")
-        os.makedirs(self.temp_dir, exist_ok=True)
+        self.temp_dir = store_dir or os.path.join(tempfile.gettempdir(), "es_screenshots")
         
-        self.create_main_layout()
         self.create_floating_button()
+        self.pipeline = self.create_pipeline()
+        self.ui.start()
+        self.metrics = None
+        if metrics_file or metrics_port is not None:
+            self.metrics = MetricsExporter(self.tracer, self.metrics_gauges, metrics_file, metrics_port,
+                                           metrics_interval)
+        
+        self.root.bind("<Unmap>", self.on_window_unmap, add="+")
+        self.button_window.bind("<Unmap>", self.on_window_unmap, add="+")
+        self.button_window.bind("<Configure>", self.on_button_configure, add="+")
         
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # Idle callbacks run after pending redraws, so the button paints first
+        self.root.after_idle(self.ensure_main_window)
+
+    def ensure_main_window(self):
+        """Build and show the main window unless that has happened already.
+        
+        Runs once the floating button is on screen, or earlier if something
+        needs the status bar or gallery first. Tk thread only.
+        """
+        if self.main_window_built:
+            return
+        self.main_window_built = True
+        # Configure ttk styles for a beautiful UI
+        self.configure_styles()
+        self.setup_icon()
+        self.root.configure(bg=self.colors["bg_light"])
+        self.create_main_layout()
+        self.root.deiconify()
+        # Scheduled from an idle callback, so it waits for the next idle pass
+        self.root.after_idle(self.open_storage)
+
+    def open_storage(self):
+        """Open the screenshot store, payload journal and response cache, once.
+        
+        Runs after the first paint, or from the first capture if that comes
+        sooner. Tk thread only.
+        """
+        if self.storage_opened:
+            return
+        self.storage_opened = True
+        retention_days, retention_mb, retention_count = self.store_options
+        self.store = ScreenshotStore(
+            self.temp_dir,
+            max_age=retention_days * 24 * 3600,
+            max_bytes=retention_mb * 1024 * 1024,
+            max_count=retention_count
+        )
+        
+        # Requests sent to the backend, written in the background; 0 MB turns it off
+        journal_max_mb, journal_backups, journal_fsync, journal_inline = self.journal_options
+        if journal_max_mb > 0:
+            self.journal = PayloadJournal(
+                self.journal_file,
+                max_bytes=journal_max_mb * 1024 * 1024,
+                backups=journal_backups,
+                fsync=journal_fsync,
+                inline=journal_inline,
+                on_error=lambda e: self.update_status(f"Error writing payload journal: {str(e)}", "error")
+            )
+        
+        # Answers for identical images survive restarts; a 0 MB budget turns it off
+        response_cache_mb, response_cache_days = self.response_cache_options
+        if response_cache_mb > 0:
+            # Next to the script if that is writable, else in the user's cache directory
+            for path in (self.response_cache_file, os.path.join(user_cache_dir(), "response_cache.sqlite3")):
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    self.response_cache = ResponseCache(
+                        path,
+                        max_bytes=response_cache_mb * 1024 * 1024,
+                        max_age=response_cache_days * 24 * 3600
+                    )
+                    break
+                except (sqlite3.Error, OSError) as e:
+                    error = e
+            if self.response_cache is None:
+                self.update_status(f"Response cache disabled, can't open it: {str(error)}", "error")
+            elif self.response_cache.path != self.response_cache_file:
+                self.update_status(f"Warning: can't write {self.response_cache_file} ({str(error)}); "
+                                   f"caching answers in {self.response_cache.path}", "info")
 
     def configure_styles(self):
         style = ttk.Style()
@@ -188,17 +2878,29 @@ class ScreenshotApp:
                         background=self.colors["bg_light"],
                         foreground=self.colors["primary"])
 
-    def save_payload_to_file(self, payload):
-        """Save the payload to a JSON file in the script directory"""
-        try:
-            with open(self.payload_file, 'w') as f:
-                json.dump(payload, f, indent=2)
-            self.update_status(f"Payload saved to {self.payload_file}", "success")
-        except Exception as e:
-            self.update_status(f"Error saving payload: {str(e)}", "error")
+    def journal_payload(self, job, session_id, extra, upload_bytes):
+        """Queue a compact record of the request for the payload journal"""
+        if self.journal is None:
+            return
+        record = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "session_id": session_id,
+            "window_title": job.window_title,
+            "prompt": CAPTURE_PROMPT,
+            "image": {"path": job.file_path, "mime_type": job.mime_type},
+            "upload_bytes": upload_bytes,
+            "upload_size": job.upload_size,
+            "image_bytes": job.image_bytes,
+            "encode_ms": round(job.encode_ms, 1) if job.encode_ms is not None else None,
+            "assistant_message": job.result,
+        }
+        if extra:
+            record.update(extra)
+        self.journal.append(record, job.encoded)
 
     def setup_icon(self):
         try:
+            from PIL import ImageTk
             icon = Image.new('RGB', (16, 16), color=self.colors["primary"])
             photo = ImageTk.PhotoImage(icon)
             self.root.iconphoto(False, photo)
@@ -227,37 +2929,83 @@ class ScreenshotApp:
             background=self.colors["bg_dark"],
             padding=10
         )
-        self.status_label.pack(fill=tk.X)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        memory_button = ttk.Button(
+            self.status_frame,
+            text="Memory",
+            command=lambda: self.update_status(self.memory_usage_report(), "info")
+        )
+        memory_button.pack(side=tk.RIGHT, padx=(5, 0))
+        
+        pipeline_button = ttk.Button(
+            self.status_frame,
+            text="Pipeline",
+            command=lambda: self.update_status(self.pipeline_report(), "info")
+        )
+        pipeline_button.pack(side=tk.RIGHT, padx=(5, 0))
+        
+        timings_button = ttk.Button(
+            self.status_frame,
+            text="Timings",
+            command=self.show_timings_panel
+        )
+        timings_button.pack(side=tk.RIGHT, padx=(5, 0))
+        
+        self.interval_button = ttk.Button(
+            self.status_frame,
+            text="Start Interval",
+            command=self.toggle_interval_capture
+        )
+        self.interval_button.pack(side=tk.RIGHT, padx=(5, 0))
         
         screenshots_frame = ttk.LabelFrame(main_frame, text="Captured Screenshots", padding=10)
         screenshots_frame.pack(fill=tk.BOTH, expand=True)
         
         self.canvas = tk.Canvas(screenshots_frame, bg="#ffffff")
         self.scrollbar = ttk.Scrollbar(screenshots_frame, orient=tk.VERTICAL, command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.configure(yscrollcommand=self.on_canvas_scroll)
         
         self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        self.screenshots_container = ttk.Frame(self.canvas)
-        self.screenshots_container_id = self.canvas.create_window(
-            (0, 0), 
-            window=self.screenshots_container, 
-            anchor=tk.NW
-        )
-        
         self.canvas.bind("<Configure>", self.on_canvas_configure)
-        self.screenshots_container.bind("<Configure>", self.on_frame_configure)
+        
+        if self.virtual_list:
+            # Cards are created on demand for the viewport only
+            self.gallery = VirtualGallery(self, self.canvas)
+        else:
+            self.screenshots_container = ttk.Frame(self.canvas)
+            self.screenshots_container_id = self.canvas.create_window(
+                (0, 0), 
+                window=self.screenshots_container, 
+                anchor=tk.NW
+            )
+            self.screenshots_container.bind("<Configure>", self.on_frame_configure)
 
         # Bind mouse wheel scrolling
         self.canvas.bind_all("<MouseWheel>", self.on_mouse_wheel)
 
     def on_canvas_configure(self, event):
         """Adjust the canvas width to match the container"""
-        self.canvas.itemconfig(self.screenshots_container_id, width=event.width)
+        if self.gallery is not None:
+            self.gallery.schedule_refresh()
+        else:
+            self.canvas.itemconfig(self.screenshots_container_id, width=event.width)
+
+    def on_canvas_scroll(self, first, last):
+        """Track the canvas view in the scrollbar and re-fill a virtual list"""
+        self.scrollbar.set(first, last)
+        if self.gallery is not None:
+            self.gallery.schedule_refresh()
+        else:
+            self.schedule_thumbnail_refresh()
 
     def on_frame_configure(self, event):
-        """Update the scroll region to encompass the entire frame"""
+        """Update the scroll region to encompass the entire frame, once per frame"""
+        self.ui.coalesce("scrollregion", self.update_scrollregion)
+    
+    def update_scrollregion(self):
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
 
     def on_mouse_wheel(self, event):
@@ -287,9 +3035,12 @@ class ScreenshotApp:
         try:
             image_path = "capture.png"
             if os.path.exists(image_path):
+                from PIL import ImageTk
                 original_img = Image.open(image_path)
                 button_size = 40
-                button_img = original_img.resize((button_size, button_size), Image.LANCZOS)
+                # Integer box reduction first, so LANCZOS only filters ~2x the final size
+                factor = max(1, min(original_img.size) // (button_size * 2))
+                button_img = original_img.reduce(factor).resize((button_size, button_size), Image.LANCZOS)
                 self.button_photo = ImageTk.PhotoImage(button_img)
                 
                 capture_button = tk.Button(
@@ -394,6 +3145,7 @@ class ScreenshotApp:
         self.spinner_label.pack(expand=True)
 
         # Create spinning animation
+        from PIL import ImageTk
         self.spinner_images = [
             ImageTk.PhotoImage(Image.new("RGB", (50, 50), (255, 255, 255)).rotate(angle))
             for angle in range(0, 360, 30)
@@ -409,6 +3161,7 @@ class ScreenshotApp:
 
     def show_loader(self):
         """Show the loader centered on the screen"""
+        self.ensure_main_window()
         if not hasattr(self, "loader_frame"):
             self.create_loader(self.root)  # Use the root window as the parent
         self.loader_frame.lift()
@@ -419,13 +3172,183 @@ class ScreenshotApp:
         if hasattr(self, "loader_frame"):
             self.loader_frame.place_forget()
 
+    def on_window_unmap(self, event):
+        """Record that one of our toplevels has been unmapped by the window system"""
+        if event.widget in (self.root, self.button_window):
+            with self.hide_lock:
+                self.pending_unmaps.discard(event.widget)
+                if not self.pending_unmaps:
+                    self.windows_hidden.set()
+    
+    def on_button_configure(self, event):
+        """Remember where the floating button is, for interval captures"""
+        if event.widget is self.button_window:
+            self.button_region = (self.button_window.winfo_rootx(), self.button_window.winfo_rooty(),
+                                  event.width, event.height)
+    
+    def button_overlaps(self, bounds):
+        """True if the floating button may show up in a grab of bounds"""
+        if bounds is None or self.button_region is None:
+            return True  # Whole-monitor fallback, or not placed yet
+        return monitor_for_region([bounds], self.button_region) is not None
+    
+    def hide_windows(self, windows=None):
+        """Withdraw our windows and wait until they are really off screen.
+        
+        Instead of a fixed sleep, this waits for the <Unmap> events of the
+        toplevels (both unless windows names some), then for a short settle
+        period so the windows underneath (or the compositor) can repaint. If
+        the events never arrive, it gives up after hide_timeout. Returns the
+        seconds spent waiting.
+        """
+        start = time.perf_counter()
+        self.windows_hidden.clear()
+        self.ui.call(self.withdraw_windows, windows)
+        
+        if self.windows_hidden.wait(self.hide_timeout):
+            time.sleep(self.hide_settle)
+        return time.perf_counter() - start
+    
+    def withdraw_windows(self, windows=None):
+        """Withdraw our toplevels (on the Tk thread), noting which unmaps to wait for"""
+        windows = windows or (self.root, self.button_window)
+        with self.hide_lock:
+            self.pending_unmaps = {window for window in windows if window.winfo_ismapped()}
+            if not self.pending_unmaps:
+                self.windows_hidden.set()
+        
+        for window in windows:
+            window.withdraw()
+    
+    def show_windows(self, windows=None):
+        windows = windows or (self.root, self.button_window)
+        if self.root in windows and self.main_window_built:
+            self.root.deiconify()
+        if self.button_window in windows:
+            self.button_window.deiconify()
+    
+    def create_pipeline(self):
+        """Connect the capture stages, each with its own worker pool"""
+        return CapturePipeline(
+            [
+                PipelineStage("capture", self.capture_active_window, workers=1, maxsize=1),
+                PipelineStage("preprocess", self.preprocess_capture, workers=2),
+                PipelineStage("encode", self.encode_capture, workers=2),
+                PipelineStage("upload", self.upload_capture, workers=4),
+                # Widget updates are handed to the Tk thread via self.ui
+                PipelineStage("render", self.render_capture, workers=1),
+            ],
+            on_error=self.on_pipeline_error,
+            on_idle=lambda: self.ui.coalesce("loader", self.hide_loader)
+        )
+    
+    def submit_capture(self, job):
+        """Start job through the pipeline; returns False if it can't take it now"""
+        if self.is_capturing:
+            return False
+        
+        self.open_storage()
+        self.is_capturing = True
+        job.traced = self.tracer.sampled()
+        job.submitted_at = time.perf_counter()
+        # Show loader centered on the screen; shares a key with the idle hide
+        # so whichever was requested last wins
+        self.ui.coalesce("loader", self.show_loader)
+        if not self.pipeline.submit(job):
+            self.is_capturing = False
+            return False
+        return True
+    
     def handle_capture(self):
         if self.is_capturing:
             return
-            
-        capture_thread = threading.Thread(target=self.capture_active_window)
-        capture_thread.daemon = True
-        capture_thread.start()
+        
+        if not self.submit_capture(CaptureJob()):
+            self.update_status("Capture pipeline is busy, try again shortly", "info")
+    
+    def toggle_interval_capture(self):
+        self.ensure_main_window()
+        if self.interval_capture.running:
+            self.interval_capture.stop()
+            self.interval_button.configure(text="Start Interval")
+            stats = self.interval_capture.stats()
+            self.update_status(
+                f"Interval capture stopped: {stats['completed']} frames at "
+                f"{stats['achieved_fps']:.2f} fps, {stats['dropped']} dropped", "info"
+            )
+        else:
+            self.interval_capture.start()
+            self.interval_button.configure(text="Stop Interval")
+            self.update_status(
+                f"Interval capture started at {1 / self.interval_capture.base_interval:.2f} fps", "info"
+            )
+    
+    def on_pipeline_error(self, stage, job, error):
+        self.tracer.count("errors_total", label=stage.name)
+        self.update_status(f"Error capturing screenshot: {str(error)}", "error")
+        if job is not None and job.streamed:
+            # Its card was shown early; don't leave it waiting for an answer
+            self.ui.call(self.finish_streamed_capture, job)
+    
+    def show_timings_panel(self):
+        """Open (or raise) the recent per-stage timings window"""
+        if self.timings_panel is not None and self.timings_panel.window.winfo_exists():
+            self.timings_panel.window.lift()
+        else:
+            self.timings_panel = TimingsPanel(self)
+    
+    def metrics_gauges(self):
+        """Current queue depths and in-flight counts for the metrics export"""
+        stats = self.pipeline.stats()
+        return {
+            "queue_depth": {stage["name"]: stage["queue_depth"] for stage in stats},
+            "stage_active": {stage["name"]: stage["active"] for stage in stats},
+            "in_flight": self.pipeline.in_flight,
+        }
+    
+    def pipeline_report(self):
+        parts = []
+        for stats in self.pipeline.stats():
+            parts.append(
+                f"{stats['name']}: {stats['processed']} done, {stats['throughput']:.2f}/s, "
+                f"queue {stats['queue_depth']}/{stats['queue_size']}, {stats['active']} active"
+            )
+        if self.deduplicator is not None:
+            parts.append(
+                f"dedup: {self.deduplicator.hits}/{self.deduplicator.lookups} hits "
+                f"({self.deduplicator.hit_rate:.0%})"
+            )
+        if self.interval_capture.started_at is not None:
+            interval = self.interval_capture.stats()
+            parts.append(
+                f"interval: {'running' if interval['running'] else 'stopped'}, "
+                f"{interval['achieved_fps']:.2f} fps achieved (target {interval['target_fps']:.2f}, "
+                f"now {interval['current_fps']:.2f}), {interval['dropped']} dropped"
+            )
+        if self.delta_tracker is not None:
+            tracker = self.delta_tracker
+            saved = 1 - tracker.sent_pixels / tracker.full_pixels if tracker.full_pixels else 0.0
+            parts.append(
+                f"delta: {tracker.delta_frames} deltas, {tracker.keyframes} keyframes, "
+                f"{tracker.unchanged_frames} unchanged, "
+                f"{saved:.0%} pixels saved"
+            )
+        if self.response_cache is not None:
+            cache = self.response_cache.stats()
+            parts.append(
+                f"response cache: {cache['hits']} hits, {cache['misses']} misses, "
+                f"{cache['evictions']} evicted, {cache['entries']} stored"
+            )
+        if self.store is not None:
+            store = self.store.stats()
+            parts.append(
+                f"store: {store['entries']} files, {store['bytes'] / (1024 * 1024):.1f} MB, "
+                f"{store['deduplicated']} deduplicated, {store['collected']} collected"
+            )
+        parts.append(
+            f"ui: {self.ui.queued} updates in {self.ui.drains} frames, {self.ui.coalesced} coalesced"
+        )
+        return " | ".join(parts)
     
     def get_window_info(self):
         system = platform.system()
@@ -480,68 +3403,147 @@ class ScreenshotApp:
                 return f"Window_{datetime.now().strftime('%H%M%S')}", None
         
         elif system == 'Linux':
-            try:
-                import subprocess
-                
-                win_id_cmd = ["xdotool", "getactivewindow"]
-                win_id = subprocess.check_output(win_id_cmd).decode('utf-8').strip()
-                
-                name_cmd = ["xdotool", "getwindowname", win_id]
-                title = subprocess.check_output(name_cmd).decode('utf-8').strip()
-                
-                geo_cmd = ["xdotool", "getwindowgeometry", win_id]
-                geo_output = subprocess.check_output(geo_cmd).decode('utf-8')
-                
-                pos_line = [line for line in geo_output.split('\n') if "Position" in line][0]
-                pos_parts = pos_line.split(":")[1].strip().split(",")
-                x = int(pos_parts[0])
-                y = int(pos_parts[1])
-                
-                size_line = [line for line in geo_output.split('\n') if "Geometry" in line][0]
-                size_parts = size_line.split(":")[1].strip().split("x")
-                width = int(size_parts[0])
-                height = int(size_parts[1])
-                
-                return title, (x, y, width, height)
-            except Exception as e:
-                return f"Window_{datetime.now().strftime('%H%M%S')}", None
+            x11_query = self.get_x11_query()
+            if x11_query is not None:
+                try:
+                    info = x11_query.active_window_info()
+                    if info is not None:
+                        return info
+                except Exception:
+                    pass
+            # xdotool is only the fallback when Xlib is unavailable
+            return self.get_window_info_xdotool()
         
         return f"Window_{datetime.now().strftime('%H%M%S')}", None
     
-    def capture_active_window(self):
-        self.is_capturing = True
-        self.show_loader()  # Show loader centered on the screen
-
+    def get_x11_query(self):
+        """Return the shared X11WindowQuery, or None if Xlib can't be used here"""
+        if self.x11_query is None:
+            try:
+                self.x11_query = X11WindowQuery()
+            except Exception:
+                self.x11_query = False
+        return self.x11_query or None
+    
+    def get_window_info_xdotool(self):
+        """Active window title and bounds on Linux via three xdotool calls"""
         try:
-            self.root.withdraw()
-            self.button_window.withdraw()
+            import subprocess
+            
+            win_id_cmd = ["xdotool", "getactivewindow"]
+            win_id = subprocess.check_output(win_id_cmd).decode('utf-8').strip()
+            
+            name_cmd = ["xdotool", "getwindowname", win_id]
+            title = subprocess.check_output(name_cmd).decode('utf-8').strip()
+            
+            geo_cmd = ["xdotool", "getwindowgeometry", win_id]
+            geo_output = subprocess.check_output(geo_cmd).decode('utf-8')
             
-            time.sleep(0.5)
+            pos_line = [line for line in geo_output.split('\n') if "Position" in line][0]
+            pos_parts = pos_line.split(":")[1].strip().split(",")
+            x = int(pos_parts[0])
+            y = int(pos_parts[1])
             
-            window_title, window_bounds = self.get_window_info()
+            size_line = [line for line in geo_output.split('\n') if "Geometry" in line][0]
+            size_parts = size_line.split(":")[1].strip().split("x")
+            width = int(size_parts[0])
+            height = int(size_parts[1])
+            
+            return title, (x, y, width, height)
+        except Exception as e:
+            return f"Window_{datetime.now().strftime('%H%M%S')}", None
+    
+    def physical_bounds(self, bounds):
+        """Map window bounds from get_window_info to the grab's physical pixels"""
+        # Measured per capture: DPI awareness may have changed since the last one
+        scale = display_scale()
+        if scale == 1.0:
+            return bounds
+        return scale_region(bounds, scale)
+    
+    def fallback_region(self, job):
+        """The monitor to grab when the active window has no bounds, or None
+        for the whole desktop (one monitor, or the layout is unknown).
+        
+        Interval captures follow the pointer. A click puts the pointer on
+        our own floating button, so those prefer the monitor of the last
+        captured window.
+        """
+        if platform.system() != "Linux":
+            return None
+        x11_query = self.get_x11_query()
+        if x11_query is None:
+            return None
+        try:
+            monitors = x11_query.monitors()
+            pointer = x11_query.pointer_position()
+        except Exception:
+            return None
+        if len(monitors) < 2:
+            return None
+        under_pointer = monitor_containing(monitors, pointer) if pointer else None
+        last_window = (
+            monitor_for_region(monitors, self.last_window_region) if self.last_window_region else None
+        )
+        if job.interval:
+            return under_pointer or last_window
+        return last_window or under_pointer
+    
+    def grab_screen(self, region=None):
+        """Grab region (x, y, width, height), or the whole screen, with the
+        configured backend; pyautogui takes over if that backend fails"""
+        if self.grabber is None:
+            self.grabber = create_grabber(self.grab_backend)
+        try:
+            return self.grabber.grab(region)
+        except Exception:
+            if self.grabber.name == "pyautogui":
+                raise
+            return PyAutoGuiGrabber().grab(region)
+    
+    def capture_active_window(self, job):
+        """Capture stage: hide our windows and grab the active window's pixels.
+        
+        Returns the job with its screenshot, or None if there is nothing to
+        capture. The capture button is released as soon as this returns.
+        """
+        hidden = ()
+        try:
+            hide = (self.root, self.button_window)
+            if job.interval:
+                # Interval ticks only hide what would get in the way, so our
+                # windows don't flicker or steal focus every tick
+                with self.tracer.span("capture.window_query", job):
+                    window_title, window_bounds = self.get_window_info()
+                if "Taro " not in window_title:
+                    # The button stays on top of other windows, so it is
+                    # still hidden when it covers part of the grab
+                    hide = (self.button_window,) if self.button_overlaps(window_bounds) else ()
+            if hide:
+                with self.tracer.span("capture.hide", job):
+                    self.hide_windows(hide)
+                hidden = hide
+            if self.root in hide:
+                with self.tracer.span("capture.window_query", job):
+                    window_title, window_bounds = self.get_window_info()
+            grab_start = time.perf_counter()
             
             if "Taro " in window_title or not window_title:
-                self.root.deiconify()
-                self.button_window.deiconify()
                 self.update_status("No active window detected or captured our own app", "info")
-                self.is_capturing = False
-                self.hide_loader()  # Hide loader on failure
-                return
+                return None
             
             # Take high-resolution screenshot
             if window_bounds:
+                window_bounds = self.physical_bounds(window_bounds)
                 x, y, width, height = window_bounds
                 
                 if width <= 0 or height <= 0:
-                    self.root.deiconify()
-                    self.button_window.deiconify()
                     self.update_status("Invalid window dimensions detected", "error")
-                    self.is_capturing = False
-                    self.hide_loader()  # Hide loader on failure
-                    return
+                    return None
                 
-                screenshot = pyautogui.screenshot(region=(x, y, width, height))
+                screenshot = self.grab_screen((x, y, width, height))
                 capture_type = "active window"
+                self.last_window_region = window_bounds
             else:
                 if platform.system() == 'Windows':
                     try:
@@ -581,114 +3583,265 @@ class ScreenshotApp:
                         
                         capture_type = "active window"
                     except Exception:
-                        screenshot = pyautogui.screenshot()
+                        screenshot = self.grab_screen()
                         capture_type = "full screen (fallback)"
                 else:
-                    screenshot = pyautogui.screenshot()
-                    capture_type = "full screen (fallback)"
-            
-            self.root.deiconify()
-            self.button_window.deiconify()
-            
-            sanitized_title = ''.join(c for c in window_title if c.isalnum() or c in ' -_')[:30]
-            timestamp = datetime.now().strftime("%H%M%S")
-            filename = f"screenshot_{timestamp}_{sanitized_title}.png"
-            file_path = os.path.join(self.temp_dir, filename)
-            
-            # Save original high-resolution image
-            screenshot.save(file_path, quality=95)
+                    # Only the relevant monitor, not the whole multi-monitor desktop
+                    monitor = self.fallback_region(job)
+                    screenshot = self.grab_screen(monitor)
+                    capture_type = "monitor (fallback)" if monitor else "full screen (fallback)"
             
-            # Compress image for base64 encoding
-            compressed_img = self.compress_image(screenshot)
-            
-            # Convert screenshot to base64
-            buffered = BytesIO()
-            compressed_img.save(buffered, format="PNG", optimize=True)
-            img_str_raw = base64.b64encode(buffered.getvalue()).decode()
-            
-            # Add data URI prefix to base64 string
-            img_str = f"data:image/png;base64,{img_str_raw}"
-            
-            # Create JSON payload with the base64 image
+        finally:
+            if hidden:
+                self.ui.call(self.show_windows, hidden)
+            self.is_capturing = False
+        
+        self.tracer.record("capture.grab", (time.perf_counter() - grab_start) * 1000, job)
+        job.window_title = window_title
+        job.window_bounds = window_bounds
+        job.capture_type = capture_type
+        job.screenshot = screenshot
+        return job
+    
+    def preprocess_capture(self, job):
+        """Preprocess stage: downscale the screenshot for upload and look
+        for a duplicate of a recent capture of the same window"""
+        with self.tracer.span("preprocess.resize", job):
+            job.upload_image, job.profile = self.compress_image(job.screenshot)
+        if job.interval:
+            # Interval capture uses the hash to spot unchanged frames
+            with self.tracer.span("preprocess.phash", job):
+                job.phash = perceptual_hash(job.upload_image)
+        if self.deduplicator is not None:
+            with self.tracer.span("preprocess.signature", job):
+                job.signature = dedup_signature(job.upload_image)
+            cached = self.deduplicator.lookup(job.window_title, job.signature)
+            if cached is not None:
+                job.result = cached
+                job.duplicate = True
+                self.tracer.count("duplicates_total")
+        
+        if self.delta_tracker is not None and not job.duplicate:
+            with self.tracer.span("preprocess.delta", job):
+                job.delta = self.delta_tracker.diff((job.window_title, job.window_bounds), job.upload_image)
+            if job.delta is not None and job.delta["box"] is None:
+                # Nothing changed since the last capture of this window
+                previous = self.delta_answers.get((job.window_title, job.window_bounds))
+                if previous is not None:
+                    job.result = previous
+                    job.duplicate = True
+                    self.tracer.count("duplicates_total")
+                else:
+                    job.delta = None  # No answer to reuse; send the whole frame
+            elif job.delta is not None:
+                # Only the bounding box of the changed tiles is uploaded
+                x, y, width, height = job.delta["box"]
+                job.upload_image = job.upload_image.crop((x, y, x + width, y + height))
+        return job
+    
+    def encode_capture(self, job):
+        """Encode stage: store the archival file and encode the upload bytes"""
+        # One encode stage produces the archival file and the upload bytes;
+        # base64 is produced later, chunk by chunk, by StreamingPayload
+        # Timings stay local: two encode workers run at once
+        job.encoded, archive_bytes, timings, job.upload_size = self.encoder.encode_pair(
+            job.screenshot, job.upload_image, job.profile
+        )
+        job.image_bytes = len(job.encoded)
+        job.encode_ms = timings["encode_upload"] + timings.get("quantize", 0) + timings.get("shrink", 0)
+        
+        # Stored under its content hash: identical captures share one file
+        start = time.perf_counter()
+        job.file_path = self.store.put(archive_bytes, self.encoder.archive_extension, job.window_title)
+        timings["store"] = (time.perf_counter() - start) * 1000
+        for name, ms in timings.items():
+            self.tracer.record(f"encode.{name}", ms, job)
+        job.mime_type = self.encoder.upload_mime
+        job.upload_image = None
+        return job
+    
+    def upload_capture(self, job):
+        """Upload stage: send the image to the backend and keep the answer"""
+        if job.duplicate:
+            # Duplicate of a recent capture: reuse its answer, no upload
+            job.encoded = None
+            return job
+        
+        cache_key = None
+        if self.response_cache is not None:
+            with self.tracer.span("upload.cache_lookup", job):
+                context = ""
+                if job.delta is not None:
+                    context = json.dumps([job.delta["keyframe"], job.delta["box"]])
+                cache_key = ResponseCache.key(job.encoded, CAPTURE_PROMPT, self.transport.url, context)
+                job.result = self.response_cache.get(cache_key)
+        
+        if job.result is not None:
+            # Identical image already answered (possibly in an earlier session)
+            job.cache_hit = True
+            self.tracer.count("cache_hits_total")
+        else:
+            # The JSON body (with the base64 image twice) is streamed in chunks
+            # from the encoded bytes rather than built in memory
             session_id = str(uuid.uuid4())
-            payload_json = {
-                "session_id": session_id,
-                "user_message": {
-                    "type": "image",
-                    "image": [img_str],
-                },
-                "conversation_history": [
-                    {
-                        "role": "user",
-                        "content": "get only the Inspector's Notes and Engine description from this image",
-                        "attachments": [
-                            {
-                                "type": "file",
-                                "base64String": [img_str]
-                            }
-                        ]
-                    }
-                ]
-            }
+            extra = {"delta": job.delta} if job.delta is not None else None
+            if self.stream_responses:
+                extra = dict(extra or {}, stream=True)
+            payload = StreamingPayload(job.encoded, job.mime_type, session_id, extra=extra)
             
-            # Comment out the API call and use mock response
-            result = self.make_api_call(payload_json)
-            
-            self.save_payload_to_file(payload_json)
-            
-            # Add to screenshots list (at the beginning)
-            self.screenshots.insert(0, {
-                "image": screenshot,
-                "title": window_title,
-                "timestamp": datetime.now().strftime("%H:%M:%S"),
-                "path": file_path,
-                "base64": img_str,
-                "payload_json": payload_json,
-                "api_response": result
-            })
-            
-            # Clear existing screenshots from UI
-            for widget in self.screenshots_container.winfo_children():
-                widget.destroy()
-            
-            # Update the UI with all screenshots (newest first)
-            for i in range(len(self.screenshots)):
-                self.add_screenshot_to_ui(i)
+            with self.tracer.span("upload.http", job):
+                if self.stream_responses:
+                    job.result = self.make_streaming_api_call(payload, job)
+                else:
+                    job.result = self.make_api_call(payload, job)
+            if job.result is not None and cache_key is not None and not job.interrupted:
+                self.response_cache.put(cache_key, job.result)
             
-            self.update_status(f"Captured {capture_type}: {window_title}", "success")
+            # The payload is dropped after upload; only its size is kept
+            job.upload_bytes = len(payload)
+            with self.tracer.span("upload.journal", job):
+                self.journal_payload(job, session_id, extra, job.upload_bytes)
+            self.tracer.count("upload_bytes_total", job.upload_bytes)
         
-        except Exception as e:
-            self.update_status(f"Error capturing screenshot: {str(e)}", "error")
+        if job.result is not None and not job.interrupted:
+            # The answer to a delta only covers the crop, so it isn't kept
+            # for duplicates of the whole frame
+            if job.signature is not None and self.deduplicator is not None and job.delta is None:
+                self.deduplicator.remember(job.window_title, job.signature, job.result)
+            if self.delta_tracker is not None:
+                self.delta_answers[(job.window_title, job.window_bounds)] = job.result
+                while len(self.delta_answers) > self.delta_tracker.max_windows:
+                    self.delta_answers.popitem(last=False)
+        job.encoded = None
+        return job
+    
+    def render_capture(self, job):
+        """Render stage: record the capture and add its card to the gallery"""
+        if job.streamed:
+            # The card was added when the streamed answer started
+            self.ui.call(self.finish_streamed_capture, job)
+        else:
+            self.ui.call(self.record_capture, job, job.result)
         
-        finally:
-            self.is_capturing = False
-            self.hide_loader()  # Hide loader when capture is complete
+        if job.duplicate and job.delta is not None:
+            reused = " (unchanged, reused previous answer)"
+        elif job.duplicate:
+            reused = " (duplicate, reused previous answer)"
+        elif job.cache_hit:
+            reused = " (cached answer)"
+        else:
+            reused = ""
+        encoded = ""
+        if job.upload_size is not None:
+            width, height = job.upload_size
+            encoded = f" [{width}x{height}, {job.image_bytes / 1024:.0f} KB in {job.encode_ms:.0f} ms]"
+        if job.error is not None:
+            # The capture is kept, but there is no (complete) answer
+            self.update_status(f"Captured {job.capture_type}: {job.window_title}{encoded}, "
+                               f"but the backend request failed: {job.error}", "error")
+        else:
+            self.update_status(f"Captured {job.capture_type}: {job.window_title}{reused}{encoded}", "success")
+        self.tracer.count("captures_total")
+        if job.submitted_at is not None:
+            self.tracer.record("capture.total", (time.perf_counter() - job.submitted_at) * 1000, job)
+        
+        if job.interval:
+            self.ui.call(self.interval_capture.frame_done, job)
     
-    def compress_image(self, image, quality=100, max_size=1024):
-        """Compress image to reduce file size while maintaining quality"""
-        width, height = image.size
+    def record_capture(self, job, api_response):
+        """Add job's capture to the top of the gallery and return its record"""
+        screenshot = job.screenshot
         
-        # Resize if larger than max_size
-        if width > max_size or height > max_size:
-            if width > height:
-                new_width = max_size
-                new_height = int(height * (max_size / width))
-            else:
-                new_height = max_size
-                new_width = int(width * (max_size / height))
-            
-            image = image.resize((new_width, new_height), Image.LANCZOS)
+        # Keep only compact metadata; the full image lives on disk and in
+        # the bounded image cache
+        self.image_cache.put(job.file_path, screenshot)
+        record = CaptureRecord(
+            title=job.window_title,
+            timestamp=datetime.now().strftime("%H:%M:%S"),
+            path=job.file_path,
+            width=screenshot.width,
+            height=screenshot.height,
+            upload_bytes=job.upload_bytes,
+            api_response=api_response
+        )
+        self.screenshots.insert(0, record)
+        job.screenshot = None
+        
+        # Build only the new card and insert it at the top; existing
+        # cards keep their widgets, PhotoImages and rendered markdown
+        with self.tracer.span("render.ui", job):
+            self.add_screenshot_to_ui(0)
+        return record
+    
+    def begin_streamed_capture(self, job):
+        """Show job's card before its answer arrives, with an empty response"""
+        job.record = self.record_capture(job, "")
+    
+    def queue_streamed_text(self, job, text):
+        """Called by the upload worker for each piece; one append per frame takes them all"""
+        job.stream_pieces.append(text)
+        self.ui.coalesce(("stream", id(job)), self.append_streamed_text, job)
+    
+    def append_streamed_text(self, job):
+        """Append the streamed pieces received so far to the record and its card, if one is shown"""
+        count = len(job.stream_pieces)
+        text = "".join(job.stream_pieces[:count])
+        del job.stream_pieces[:count]
+        if not text:
+            return
+        record = job.record
+        first = not record.api_response
+        record.api_response += text
+        card = self.card_for(record)
+        if card is None:
+            return  # Scrolled out of a virtual list; show() renders the text so far
+        if first:
+            card.show_response(text)
+        else:
+            card.append_response(text)
+    
+    def finish_streamed_capture(self, job):
+        """Store the final answer; re-render only if it differs from what was streamed.
         
-        # Create compressed image
-        output = BytesIO()
-        image.save(output, format='PNG', optimize=True, quality=quality)
-        output.seek(0)
-        return Image.open(output)
+        Also runs when the upload stage failed: the text streamed so far is
+        kept rather than leaving the card waiting.
+        """
+        record = job.record
+        if record is None:
+            return
+        self.append_streamed_text(job)
+        if job.result is None and record.api_response:
+            job.result = record.api_response
+        if record.api_response != job.result:
+            record.api_response = job.result
+            card = self.card_for(record)
+            if card is not None:
+                card.show_response(job.result)
+        record.upload_bytes = job.upload_bytes
+    
+    def card_for(self, record):
+        """The card currently showing record, or None"""
+        if self.gallery is not None:
+            entry = self.gallery.active.get(record)
+            return entry[0] if entry is not None else None
+        for card in self.screenshot_cards:
+            if card.record is record:
+                return card
+        return None
+    
+    def compress_image(self, image):
+        """Downscale image for upload; returns (upload_image, profile).
+        Encoding happens once in self.encoder."""
+        return self.encoder.prepare_upload(image)
     
     def update_status(self, message, status_type="info"):
+        """Show message in the status bar; safe from any thread, latest per frame wins"""
         self.status_message = message
         self.status_type = status_type
-        
+        self.ui.coalesce("status", self.show_status, message, status_type)
+    
+    def show_status(self, message, status_type):
+        self.ensure_main_window()
         if status_type == "success":
             bg_color = self.colors["success"]
             fg_color = self.colors["text_light"]
@@ -706,91 +3859,88 @@ class ScreenshotApp:
         )
     
     def add_screenshot_to_ui(self, index):
-        screenshot_data = self.screenshots[index]
-        
-        # Check if API response exists
-        response_text = screenshot_data.get("api_response", "No API response available")
-
-        frame = ttk.Frame(self.screenshots_container)
-        frame.pack(fill=tk.X, pady=(0, 15), padx=10)
-
-        # --- API Response Card ---
-        response_card = ttk.Frame(frame, relief="solid", borderwidth=1, padding=10)
-        response_card.pack(fill=tk.X, padx=5, pady=5)
-
-        # --- Scrollable Text Container ---
-        text_frame = ttk.Frame(response_card)
-        text_frame.pack(fill=tk.BOTH, expand=True)
-
-        # --- Scrollbars ---
-        v_scrollbar = ttk.Scrollbar(text_frame, orient="vertical")
-        
-        # --- Response Content with Markdown Formatting ---
-        response_content = MarkdownText(
-            text_frame,
-            wrap=tk.WORD,  # Wrap words to avoid horizontal scrolling unless necessary
-            height=20,  # Default height
-            width=70,
-            font=("Segoe UI", 10),
-            bg="#DBEAF7",
-            relief=tk.FLAT,
-            padx=10,
-            pady=5,
-            yscrollcommand=v_scrollbar.set,
-          
-        )
-        
-        # Insert Markdown text
-        response_content.insert_markdown(response_text)
-        
-        response_content.config(state=tk.DISABLED)  # Make it read-only
-
-        # Pack elements
-        v_scrollbar.config(command=response_content.yview)
-      
-        response_content.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
-        v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-      
-        # --- Screenshot Below ---
-        img = screenshot_data.get("image")
-        if img:
-            max_width = 600
-            width, height = img.size
-            ratio = min(max_width / width, 1.0)
-            new_width = int(width * ratio)
-            new_height = int(height * ratio)
-            thumbnail = img.resize((new_width, new_height), Image.LANCZOS)
-            photo = ImageTk.PhotoImage(thumbnail)
-            screenshot_data["photo"] = photo
-            
-            image_frame = ttk.Frame(frame, borderwidth=1, relief="solid")
-            image_frame.pack(pady=5)
-            
-            image_label = ttk.Label(image_frame, image=photo)
-            image_label.image = photo
-            image_label.pack()
-        
-        # --- Header for Open Button ---
-        title_frame = ttk.Frame(frame)
-        title_frame.pack(fill=tk.X)
-        
-        title_label = ttk.Label(
-            title_frame,
-            text=f"{screenshot_data['title']} - {screenshot_data['timestamp']}",
-            font=("Arial", 10, "bold"),
-            foreground=self.colors["primary"]
-        )
-        title_label.pack(side=tk.LEFT, pady=5)
+        """Show self.screenshots[index] in the gallery at the matching
+        position, leaving the other cards untouched"""
+        self.ensure_main_window()
+        if self.gallery is not None:
+            self.gallery.insert(index)
+            return
         
-        open_button = ttk.Button(
-            title_frame,
-            text="Open Image",
-            command=lambda path=screenshot_data["path"]: self.open_screenshot(path),
-        )
-        open_button.pack(side=tk.RIGHT, padx=5)
+        record = self.screenshots[index]
+        card = ScreenshotCard(self.screenshots_container, self)
+        if index < len(self.screenshot_cards):
+            card.pack(fill=tk.X, pady=(0, 15), padx=10, before=self.screenshot_cards[index])
+        else:
+            card.pack(fill=tk.X, pady=(0, 15), padx=10)
+        self.screenshot_cards.insert(index, card)
+        card.show(record, self.make_thumbnail(record))
+        self.card_thumbnails[card] = None
         
         self.on_frame_configure(None)
+        self.schedule_thumbnail_refresh()
     
+    def schedule_thumbnail_refresh(self):
+        """Refresh card thumbnails once the current burst of scroll events has been handled"""
+        if self._thumbnail_refresh is None:
+            self._thumbnail_refresh = self.canvas.after_idle(self.refresh_card_thumbnails)
+    
+    def refresh_card_thumbnails(self):
+        """Reload thumbnails of cards in view and, while over thumbnail_budget,
+        release those of the cards least recently in view"""
+        self._thumbnail_refresh = None
+        cards = self.screenshot_cards
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        # Cards are stacked top to bottom; find the first one reaching into view
+        first = bisect.bisect_right(range(len(cards)), top,
+                                    key=lambda i: cards[i].winfo_y() + cards[i].winfo_height())
+        in_view = set()
+        for card in cards[first:]:
+            if card.winfo_y() > bottom:
+                break
+            in_view.add(card)
+            if card.photo_released:
+                card.set_photo(self.make_thumbnail(card.record))
+            self.card_thumbnails[card] = None
+            self.card_thumbnails.move_to_end(card)
+        
+        for card in list(self.card_thumbnails):
+            if self.thumbnail_bytes <= self.thumbnail_budget:
+                break
+            if card not in in_view:
+                self.thumbnail_bytes -= card.release_photo()
+                del self.card_thumbnails[card]
+    
+    def thumbnail_size(self, width, height, max_width=600):
+        ratio = min(max_width / width, 1.0)
+        return int(width * ratio), int(height * ratio)
+    
+    def make_thumbnail(self, record):
+        """Return a PhotoImage thumbnail for record, or None if its image can't be loaded"""
+        try:
+            img = self.image_cache.get(record.path)
+        except OSError:
+            return None
+        new_width, new_height = self.thumbnail_size(*img.size)
+        thumbnail = img.resize((new_width, new_height), Image.LANCZOS)
+        self.thumbnail_bytes += new_width * new_height * 4
+        from PIL import ImageTk
+        return ImageTk.PhotoImage(thumbnail)
+    
+    def memory_usage_report(self):
+        """Summarise memory held by capture records, cached images and thumbnails"""
+        cache = self.image_cache.stats()
+        records_bytes = sum(record.nbytes() for record in self.screenshots)
+        rss = get_process_rss()
+        mb = 1024 * 1024
+        return (
+            f"Captures: {len(self.screenshots)} ({records_bytes / 1024:.1f} KB metadata) | "
+            f"Image cache: {cache['entries']} images, {cache['bytes'] / mb:.1f}/"
+            f"{cache['budget_bytes'] / mb:.0f} MB, {cache['evictions']} evicted | "
+            f"Thumbnails: {self.thumbnail_bytes / mb:.1f} MB | "
+            f"Process RSS: {f'{rss / mb:.1f} MB' if rss is not None else 'n/a'}"
+        )
+
     def open_screenshot(self, path):
         try:
             if platform.system() == 'Windows':
@@ -819,29 +3969,340 @@ class ScreenshotApp:
             self.update_status(f"Error opening folder: {str(e)}", "error")
     
     def on_close(self):
+        self.ui.stop()
+        if self.store is not None:
+            self.store.close()
+        if self.journal is not None:
+            self.journal.close()
+        if self.metrics is not None:
+            self.metrics.close()
+        self.interval_capture.stop()
+        self.pipeline.stop()
+        self.transport.close()
+        if self.x11_query:
+            self.x11_query.close()
+        if self.grabber is not None:
+            self.grabber.close()
+        if self.response_cache is not None:
+            self.response_cache.close()
         self.root.destroy()
         
-    def make_api_call(self, payload):
-        self.show_loader()  # Show loader centered on the screen
+    def make_api_call(self, payload, job):
+        """Send a StreamingPayload to the backend and return its assistant_message.
+        
+        A failed request returns None and leaves its exception in job.error.
+        """
+        import requests
         try:
-            url = "http://localhost:8001/v1/chat"
-            headers = {
-                "Content-Type": "application/json",
-            }
-
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-
-            return response.json().get("assistant_message")
+            return self.transport.post_json(data=payload).get("assistant_message")
 
         except requests.exceptions.RequestException as e:
-            print("The error is:", str(e))
+            self.tracer.count("errors_total", label="upload")
+            job.error = e
             return None
 
-        finally:
-            self.hide_loader()  # Hide loader when API call is complete
+    def make_streaming_api_call(self, payload, job):
+        """Like make_api_call, but show the capture now and its answer as it streams in.
+        
+        If the stream breaks off, the text received so far is returned with
+        a note and job.interrupted is set, so it isn't cached as an answer.
+        """
+        import requests
+        job.streamed = True
+        self.ui.call(self.begin_streamed_capture, job)
+        received = []
+        
+        def on_text(text):
+            received.append(text)
+            self.queue_streamed_text(job, text)
+        
+        try:
+            return self.transport.post_stream(payload, on_text)
+        except requests.exceptions.RequestException as e:
+            self.tracer.count("errors_total", label="upload")
+            job.error = e
+            if not received:
+                return None
+            job.interrupted = True
+            return "".join(received) + f"\n\n*(Answer interrupted: {e})*"
+
+BATCH_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+
+def find_batch_images(source):
+    """Image paths under a directory (recursively) or matching a glob, sorted"""
+    if os.path.isdir(source):
+        paths = [
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(source)
+            for name in names
+            if name.lower().endswith(BATCH_IMAGE_EXTENSIONS)
+        ]
+    else:
+        paths = [path for path in glob.glob(source, recursive=True) if os.path.isfile(path)]
+    return sorted(paths)
+
+
+def encode_file_for_upload(path, encoder):
+    """Process-pool worker: open, downscale and encode one image for upload.
+    
+    Returns (upload_bytes, stats) with the upload image size, its encoded
+    bytes and the time spent decoding, downscaling and encoding it.
+    """
+    start = time.perf_counter()
+    with Image.open(path) as image:
+        # JPEG decodes straight at a reduced scale (DCT scaling) when that
+        # still leaves at least size_limit pixels a side
+        image.draft("RGB", (encoder.size_limit, encoder.size_limit))
+        upload_image, profile = encoder.prepare_upload(image)
+        upload_bytes, _, upload_size = encoder.encode_upload_image(upload_image, profile)
+    return upload_bytes, {
+        "upload_size": list(upload_size),
+        "image_bytes": len(upload_bytes),
+        "encode_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def load_batch_progress(output_path):
+    """Paths already answered successfully in an earlier run of the same output"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by an interrupted run
+            if record.get("assistant_message") is not None:
+                done.add(record["path"])
+    return done
+
+
+def run_batch(source, output_path, encoder, transport, workers=None):
+    """Send every image under source to the backend without any UI.
+    
+    Images are downscaled and encoded on a process pool (one worker per
+    core by default) and uploaded with at most transport.max_in_flight
+    requests at once. Each result is appended to output_path as a JSON
+    line, and images already answered there are skipped, so an interrupted
+    run resumes where it stopped. Returns the number of failures.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+    paths = find_batch_images(source)
+    done = load_batch_progress(output_path)
+    pending = [path for path in paths if os.path.abspath(path) not in done]
+    print(f"{len(paths)} images found, {len(paths) - len(pending)} already done, {len(pending)} to process")
+    
+    workers = workers or os.cpu_count() or 1
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "error": 0}
+    
+    def write_result(record):
+        with write_lock:
+            counts["error" if record["error"] else "ok"] += 1
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    
+    def upload(path, encoded, stats):
+        record = {"path": os.path.abspath(path), "sha256": hashlib.sha256(encoded).hexdigest(),
+                  **stats, "upload_bytes": 0, "assistant_message": None, "error": None}
+        start = time.perf_counter()
+        try:
+            payload = StreamingPayload(encoded, encoder.upload_mime, str(uuid.uuid4()))
+            record["upload_bytes"] = len(payload)
+            record["assistant_message"] = transport.post_json(data=payload).get("assistant_message")
+        except Exception as e:
+            record["error"] = str(e)
+        record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        write_result(record)
+    
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(workers) as encode_pool, \
+            ThreadPoolExecutor(transport.max_in_flight) as upload_pool:
+        # Keep a bounded window of work in flight so memory stays flat
+        remaining = iter(pending)
+        encoding = {}
+        uploading = set()
+        while True:
+            while len(encoding) < workers * 2 and len(uploading) < transport.max_in_flight * 2:
+                path = next(remaining, None)
+                if path is None:
+                    break
+                encoding[encode_pool.submit(encode_file_for_upload, path, encoder)] = path
+            if not encoding and not uploading:
+                break
+            finished, _ = wait(set(encoding) | uploading, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in uploading:
+                    uploading.discard(future)
+                    continue
+                path = encoding.pop(future)
+                try:
+                    encoded, stats = future.result()
+                except Exception as e:
+                    write_result({"path": os.path.abspath(path), "assistant_message": None,
+                                  "error": f"encode failed: {e}"})
+                    continue
+                uploading.add(upload_pool.submit(upload, path, encoded, stats))
+    
+    elapsed = time.perf_counter() - start
+    total = counts["ok"] + counts["error"]
+    rate = total / elapsed if elapsed else 0.0
+    print(f"Processed {total} images in {elapsed:.1f} s ({rate:.2f} images/s): "
+          f"{counts['ok']} ok, {counts['error']} failed -> {output_path}")
+    return counts["error"]
+
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Capture the active window and send it to the Taro backend")
+    parser.add_argument("--memory-budget-mb", type=int, default=256,
+                        help="RAM budget for full-resolution images and card thumbnails kept in memory "
+                             "(default: 256)")
+    parser.add_argument("--virtual-list", action="store_true",
+                        help="only create gallery cards near the viewport (for very long sessions)")
+    parser.add_argument("--upload-format", choices=list(IMAGE_FORMATS), default="png",
+                        help="format of the image sent to the backend (default: png)")
+    parser.add_argument("--archive-format", choices=list(IMAGE_FORMATS), default="png",
+                        help="format of the full-resolution file kept on disk (default: png)")
+    parser.add_argument("--quality", type=int, default=90,
+                        help="target quality for the lossy jpeg/webp formats (default: 90)")
+    parser.add_argument("--optimize", choices=OPTIMIZE_LEVELS, default="default",
+                        help="encoder effort; higher is smaller but slower (default: default)")
+    parser.add_argument("--adaptive-resize", action="store_true",
+                        help="size the upload image by its text/edge density and the budgets below, and "
+                             "palette-quantize few-colour captures for png/webp-lossless uploads")
+    parser.add_argument("--adaptive-min-size", type=int, default=640,
+                        help="in adaptive mode, longest side for sparse content (default: 640)")
+    parser.add_argument("--adaptive-max-size", type=int, default=2048,
+                        help="in adaptive mode, longest side for dense text (default: 2048)")
+    parser.add_argument("--upload-budget-kb", type=float, default=None,
+                        help="in adaptive mode, size limit of each encoded upload image; images over it "
+                             "are re-encoded smaller (down to a quarter of --adaptive-min-size)")
+    parser.add_argument("--upload-token-budget", type=int, default=None,
+                        help=f"in adaptive mode, target vision tokens per image "
+                             f"(about {PIXELS_PER_TOKEN} pixels each)")
+    parser.add_argument("--api-url", default=DEFAULT_API_URL,
+                        help=f"backend chat endpoint (default: {DEFAULT_API_URL})")
+    parser.add_argument("--connect-timeout", type=float, default=3.05,
+                        help="seconds to wait for the backend connection (default: 3.05)")
+    parser.add_argument("--read-timeout", type=float, default=120,
+                        help="seconds to wait for the backend response (default: 120)")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="retries for connection errors, timeouts and 429/5xx gateway errors (default: 3)")
+    parser.add_argument("--max-in-flight", type=int, default=4,
+                        help="maximum concurrent backend requests (default: 4)")
+    parser.add_argument("--hide-timeout", type=float, default=0.5,
+                        help="longest wait in seconds for our windows to unmap before capturing (default: 0.5)")
+    parser.add_argument("--hide-settle-ms", type=float, default=50,
+                        help="repaint time after our windows unmap, in ms (default: 50)")
+    parser.add_argument("--dedup-threshold", type=int, default=-1,
+                        help="reuse a recent answer for the same window when no pixel of a 256 px "
+                             "grayscale copy differs by more than this many grey levels (0-255); "
+                             "0 needs identical copies, -1 disables (default: -1)")
+    parser.add_argument("--dedup-window", type=int, default=8,
+                        help="recent captures per window title checked for duplicates (default: 8)")
+    parser.add_argument("--response-cache-mb", type=float, default=64,
+                        help="size budget of the on-disk answer cache; 0 disables it (default: 64)")
+    parser.add_argument("--response-cache-days", type=float, default=30,
+                        help="age after which cached answers expire (default: 30)")
+    parser.add_argument("--delta-mode", action="store_true",
+                        help="for repeat captures of the same window, upload only the changed region")
+    parser.add_argument("--keyframe-interval", type=int, default=10,
+                        help="in delta mode, send the full image every N captures of a window (default: 10)")
+    parser.add_argument("--delta-tile-size", type=int, default=32,
+                        help="tile size in pixels used to detect changes in delta mode (default: 32)")
+    parser.add_argument("--interval-fps", type=float, default=0.5,
+                        help="target rate of interval capture mode, in captures/second (default: 0.5)")
+    parser.add_argument("--interval-min-fps", type=float, default=0.05,
+                        help="slowest rate interval capture backs off to (default: 0.05)")
+    parser.add_argument("--start-interval", action="store_true",
+                        help="start interval capture immediately")
+    parser.add_argument("--grab-backend", choices=["auto"] + list(GRAB_BACKENDS), default="auto",
+                        help="screen grab backend; auto picks the fastest available (default: auto)")
+    parser.add_argument("--stream", action="store_true",
+                        help="ask the backend for a streamed answer (SSE or chunked text) and show it "
+                             "as it arrives; plain JSON answers still work")
+    parser.add_argument("--store-dir", default=None,
+                        help="where captures are archived, named by content hash "
+                             "(default: es_screenshots in the temp dir)")
+    parser.add_argument("--retention-days", type=float, default=14,
+                        help="remove archived captures unused for this long (default: 14)")
+    parser.add_argument("--retention-mb", type=float, default=2048,
+                        help="keep the capture archive under this size (default: 2048)")
+    parser.add_argument("--retention-count", type=int, default=5000,
+                        help="keep at most this many archived captures (default: 5000)")
+    parser.add_argument("--journal-max-mb", type=float, default=16,
+                        help="rotate payload_journal.jsonl at this size; 0 disables the journal (default: 16)")
+    parser.add_argument("--journal-backups", type=int, default=3,
+                        help="rotated payload journal files to keep (default: 3)")
+    parser.add_argument("--journal-fsync", choices=FSYNC_POLICIES, default="batch",
+                        help="when the payload journal is fsynced (default: batch)")
+    parser.add_argument("--journal-inline", action="store_true",
+                        help="embed the uploaded image as base64 in the payload journal (for debugging)")
+    parser.add_argument("--trace-sample-rate", type=float, default=1.0,
+                        help="fraction of captures whose stage timings are traced, 0 to disable (default: 1)")
+    parser.add_argument("--metrics-file",
+                        help="export metrics periodically: Prometheus text if it ends in .prom, "
+                             "otherwise JSON lines")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-interval", type=float, default=10,
+                        help="seconds between metrics file exports (default: 10)")
+    parser.add_argument("--batch", metavar="DIR_OR_GLOB",
+                        help="headless: send existing images (a directory or glob) to the backend and exit")
+    parser.add_argument("--batch-output", default="batch_results.jsonl",
+                        help="JSON lines file for --batch results; re-running resumes it "
+                             "(default: batch_results.jsonl)")
+    parser.add_argument("--batch-workers", type=int, default=None,
+                        help="processes used to downscale and encode in --batch mode (default: one per core)")
+    args = parser.parse_args()
+    
+    transport = ApiTransport(
+        url=args.api_url,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        retries=args.retries,
+        max_in_flight=args.max_in_flight
+    )
+    
+    encoder = CaptureEncoder(
+        upload_format=args.upload_format,
+        archive_format=args.archive_format,
+        quality=args.quality,
+        optimize=args.optimize,
+        adaptive=args.adaptive_resize,
+        adaptive_min_size=args.adaptive_min_size,
+        adaptive_max_size=args.adaptive_max_size,
+        byte_budget=args.upload_budget_kb * 1024 if args.upload_budget_kb else None,
+        token_budget=args.upload_token_budget
+    )
+    
+    if args.batch:
+        failures = run_batch(args.batch, args.batch_output, encoder, transport, args.batch_workers)
+        transport.close()
+        sys.exit(1 if failures else 0)
+    
+    enable_dpi_awareness()  # Before Tk or any window geometry query
     root = tk.Tk()
-    app = ScreenshotApp(root)
+    app = ScreenshotApp(root, memory_budget_mb=args.memory_budget_mb,
+                        virtual_list=args.virtual_list, encoder=encoder, transport=transport,
+                        hide_timeout=args.hide_timeout, hide_settle=args.hide_settle_ms / 1000,
+                        grab_backend=args.grab_backend, dedup_threshold=args.dedup_threshold,
+                        dedup_window=args.dedup_window, response_cache_mb=args.response_cache_mb,
+                        response_cache_days=args.response_cache_days, delta_mode=args.delta_mode,
+                        keyframe_interval=args.keyframe_interval, delta_tile_size=args.delta_tile_size,
+                        interval_fps=args.interval_fps, interval_min_fps=args.interval_min_fps,
+                        stream_responses=args.stream, tracer=Tracer(args.trace_sample_rate),
+                        metrics_file=args.metrics_file, metrics_port=args.metrics_port,
+                        metrics_interval=args.metrics_interval, journal_max_mb=args.journal_max_mb,
+                        journal_backups=args.journal_backups, journal_fsync=args.journal_fsync,
+                        journal_inline=args.journal_inline, store_dir=args.store_dir,
+                        retention_days=args.retention_days, retention_mb=args.retention_mb,
+                        retention_count=args.retention_count)
+    if args.start_interval:
+        app.toggle_interval_capture()
     root.mainloop()
\ No newline at end of file